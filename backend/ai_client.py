@@ -0,0 +1,64 @@
+# ai_client.py
+import threading
+
+from clients import clients
+
+USAGE_FIELDS = ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens')
+
+
+def cached_system_prompt(text):
+    """System prompt marked for prompt caching.
+
+    Tools and system come first in a request, so a stable system block lets
+    later calls read that whole prefix from Anthropic's cache.
+    """
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+class AIClient:
+    """Anthropic calls through the registry's pooled client, with token usage per upstream.
+
+    Calls block the calling thread, so a web worker has at most WEB_THREADS
+    model calls from requests in flight (plus ICON_WORKER_CONCURRENCY icon
+    jobs); raise WEB_THREADS to allow more. Waiting threads hold no DB
+    connection, since the routes close their session before calling.
+    """
+
+    def __init__(self):
+        self._usage_lock = threading.Lock()
+        self._usage = {}  # upstream -> {'calls': n, field: tokens}
+
+    def create_message(self, upstream, **kwargs):
+        """messages.create on the shared client, recording usage under upstream."""
+        with clients.gauges['anthropic'].track():
+            response = clients.anthropic().messages.create(**kwargs)
+        self._record_usage(upstream, response.usage)
+        return response
+
+    def stream_text(self, upstream, **kwargs):
+        """Yield text deltas from messages.stream.
+
+        Closing the generator early (e.g. the HTTP client went away) closes the
+        upstream response so no further tokens are generated.
+        """
+        with clients.gauges['anthropic'].track():
+            with clients.anthropic().messages.stream(**kwargs) as stream:
+                yield from stream.text_stream
+                self._record_usage(upstream, stream.get_final_message().usage)
+
+    def usage_stats(self):
+        """Token totals per upstream, including prompt cache reads and writes."""
+        with self._usage_lock:
+            return {upstream: dict(totals) for upstream, totals in self._usage.items()}
+
+    def _record_usage(self, upstream, usage):
+        with self._usage_lock:
+            totals = self._usage.setdefault(upstream, dict.fromkeys(('calls',) + USAGE_FIELDS, 0))
+            totals['calls'] += 1
+            for field in USAGE_FIELDS:
+                # Cache fields are missing or None when caching didn't apply
+                totals[field] += getattr(usage, field, None) or 0
+
+
+# Initialize singleton
+ai = AIClient()
@@ -1,6 +1,5 @@
-from flask import Flask, request, jsonify, send_from_directory
-from db import db, User, Ingredient, Allergy, Recipe
-import requests
+from flask import Flask, Response, g, request, jsonify, redirect, send_file, stream_with_context
+from db import db, add_missing_columns, User, Ingredient, Allergy, Recipe, IconJob
 import json
 from dotenv import load_dotenv
 import os
@@ -8,16 +7,45 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from claude_icon_utils import (
-    generate_icon,
-    cleanup_icon_if_unused,
+    missing_icon_pairs,
+    add_icon_refs,
+    release_icon_refs,
+    delete_icons,
+    grouped_icon_pairs,
+    ensure_icon_manifest,
+    rebuild_icon_manifest,
+    list_stored_icon_keys,
+    resolve_icon_alias,
 )
+from icon_jobs import icon_worker, enqueue_icon, enqueue_icons
+from icon_catalog import DEFAULT_SEEDS_PATH, load_seeds, warm_icon_catalog
 from cloud_storage_config import storage
+from local_storage import LocalStorage
+from clients import clients
+from asset_index import asset_index, ASSET_EXTENSIONS
+from recipe_cache import recipe_cache
+from scan_cache import scan_cache
+from user_cache import user_cache
+from query_stats import query_counter
+from ingredient_search import ingredient_search
+from recipe_search import recipe_search
+from response_parsing import SCAN_ITEMS_TOOL, parse_scan_items, response_text
 import jwt
+from werkzeug.http import quote_etag
 from datetime import datetime, timedelta, timezone
 from functools import wraps
-from sqlalchemy import text
-import anthropic
+import click
+from sqlalchemy import text, insert, delete, select, func, or_, and_
+from sqlalchemy.orm import load_only
+from ai_client import ai, cached_system_prompt
+from image_prep import ImageError, image_hash, prepare_scan_image, scan_image_stats
 import base64
+import hashlib
+import hmac
+import binascii
+import shutil
+import tempfile
+from io import BytesIO
 
 
 app = Flask(__name__)
@@ -60,25 +88,115 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_pre_ping': True,
     'pool_recycle': 300,
 }
+if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    # Every request thread (blocked on a model call or not) and icon job can hold a connection
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update(
+        pool_size=int(os.getenv('DB_POOL_SIZE', str(
+            int(os.getenv('WEB_THREADS', '16')) + int(os.getenv('ICON_WORKER_CONCURRENCY', '2')) + 1
+        ))),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '5')),
+    )
 
 jwt_secret = os.getenv('JWT_SECRET_KEY')
 if not jwt_secret:
     jwt_secret = 'dev-secret-key-change-in-production'
 app.config['JWT_SECRET_KEY'] = jwt_secret
 app.config['ANTHROPIC_API_KEY'] = os.getenv('ANTHROPIC_API_KEY')
+app.config['MAX_BULK_ITEMS'] = int(os.getenv('MAX_BULK_ITEMS', '100'))
+# Requests above this are refused with 413 before the body is read
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(12 * 1024 * 1024)))
 
 # Initialize the database
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    add_missing_columns()
+    ensure_icon_manifest()
+    ingredient_search.ensure_index()
+    recipe_search.ensure_index()
+    query_counter.init_app(app, db.engine)
+
+icon_worker.init_app(app)
 
 
 def failure_response(message, code=404):
     return json.dumps({"success": False, "error": message}), code, {'Content-Type': 'application/json'}
 
 
-def success_response(data, code=200):
-    return json.dumps({"success": True, "data": data}), code, {'Content-Type': 'application/json'}
+def success_response(data, code=200, etag=None):
+    """JSON success envelope; with an etag, answers a matching If-None-Match with 304."""
+    if etag is not None and not_modified(etag):
+        return not_modified_response(etag)
+    return json_response(json.dumps({"success": True, "data": data}), code, etag)
+
+
+def json_response(body, code=200, etag=None):
+    headers = {'Content-Type': 'application/json'}
+    if etag is not None:
+        # Let browsers keep the body but revalidate it on every use
+        headers['ETag'] = quote_etag(etag, weak=True)
+        headers['Cache-Control'] = 'private, no-cache'
+    return body, code, headers
+
+
+def not_modified(etag):
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified_response(etag):
+    return '', 304, {'ETag': quote_etag(etag, weak=True), 'Cache-Control': 'private, no-cache'}
+
+
+def cached_user_read(user_id, collection, load, paged=False):
+    """Serve a per-user read from user_cache, building it with load() on a miss.
+
+    The user's data version doubles as the ETag, so a client revalidating an
+    unchanged list gets a 304 after a single primary-key lookup. With paged,
+    load() returns (items, next_cursor).
+    """
+    version = user_cache.version(user_id)
+    etag = f"{collection}-{user_id}-{version}"
+    if not_modified(etag):
+        return not_modified_response(etag)
+
+    body = user_cache.get(user_id, collection, version)
+    if body is None:
+        if paged:
+            items, next_cursor = load()
+            payload = {"success": True, "data": items, "next_cursor": next_cursor}
+        else:
+            payload = {"success": True, "data": load()}
+        body = json.dumps(payload).encode('utf-8')
+        user_cache.set(user_id, collection, version, body)
+    return json_response(body, etag=etag)
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return failure_response(f"Request body exceeds {app.config['MAX_CONTENT_LENGTH']} bytes", 413)
+
+
+def get_bulk_items(body):
+    """Return the `items` list from a bulk request body, or None if it is not a usable list."""
+    items = body.get('items') if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items or len(items) > app.config['MAX_BULK_ITEMS']:
+        return None
+    if not all(isinstance(item, dict) for item in items):
+        return None
+    return items
+
+
+def invalid_bulk_fields(item, text_fields=(), number_fields=()):
+    """Fields of a bulk item that are set to a value of the wrong JSON type."""
+    invalid = []
+    for field in text_fields:
+        if item.get(field) is not None and not isinstance(item[field], str):
+            invalid.append(field)
+    for field in number_fields:
+        value = item.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            invalid.append(field)
+    return invalid
 
 
 def generate_token(user_id):
@@ -124,6 +242,11 @@ def token_required(f):
         user_id = verify_token(token)
         if user_id is None:
             return failure_response('Invalid or expired token', 401)
+
+        # Checked once here (and cached briefly), so routes scoped to the
+        # token's user don't each look the user up again
+        if not user_cache.user_exists(user_id):
+            return failure_response("User not found")
         
         return f(user_id, *args, **kwargs)
     return decorated_function
@@ -171,19 +294,20 @@ def create_user():
 @token_required
 @authorize_user
 def get_user(current_user_id, user_id):
-    user = User.query.get(user_id)
-
+    # The token check may rely on a cached "user exists" from before another worker deleted it
+    user = db.session.get(User, user_id)
     if user is None:
+        user_cache.forget_user(user_id)
         return failure_response("User not found")
 
-    return success_response(user.to_dict())
+    return cached_user_read(user_id, 'user', user.to_dict)
 
 
 @app.route('/api/users/<int:user_id>/', methods=['PUT'])
 @token_required
 @authorize_user
 def update_user(current_user_id, user_id):
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
 
     if user is None:
         return failure_response("User not found")
@@ -205,6 +329,7 @@ def update_user(current_user_id, user_id):
     if 'password' in body:
         user.set_password(body['password'])
     
+    user_cache.bump(user_id)
     db.session.commit()
     return success_response(user.to_dict())
 
@@ -213,25 +338,36 @@ def update_user(current_user_id, user_id):
 @token_required
 @authorize_user
 def delete_user(current_user_id, user_id):
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
 
     if user is None:
         return failure_response("User not found")
     
-    # Gather ingredient and allergy data BEFORE deletion
-    ingredient_data = [(ing.name.lower(), ing.category.lower() if ing.category else None) for ing in user.ingredients]
-    allergy_data = [(al.allergy_name.lower(), al.allergy_category.lower() if al.allergy_category else None) for al in user.allergies]
-
+    # Gather ingredient and allergy data BEFORE deletion, one grouped query each
+    ingredient_pairs = grouped_icon_pairs('ingredient', user_id)
+    allergy_pairs = grouped_icon_pairs('allergy', user_id)
+    data = user.to_dict(ingredients_count=sum(ingredient_pairs.values()))
+
+    # Delete child rows in bulk so the ORM cascade doesn't load them one by one
+    db.session.execute(delete(Ingredient).where(Ingredient.user_id == user_id))
+    db.session.execute(delete(Allergy).where(Allergy.user_id == user_id))
+    db.session.execute(delete(Recipe).where(Recipe.user_id == user_id))
     db.session.delete(user)
+    released = release_icon_refs(ingredient_pairs, 'ingredient') + release_icon_refs(allergy_pairs, 'allergy')
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
+    scan_cache.invalidate_user(user_id)
     db.session.commit()
+    user_cache.forget_user(user_id)
 
-    for name, category in ingredient_data:
-        cleanup_icon_if_unused(name, category, 'ingredient', Ingredient, 'name')
-
-    for name, category in allergy_data:
-        cleanup_icon_if_unused(name, category, 'allergy', Allergy, 'allergy_name')
+    # The user's personal scan icons go too
+    released += [user_scan_icon_key(user_id, name, category, 'ingredients') for name, category in ingredient_pairs]
+    released += [user_scan_icon_key(user_id, name, category, 'allergies') for name, category in allergy_pairs]
 
-    return success_response(user.to_dict())
+    # Storage deletes run after the response has been sent
+    response = app.make_response(success_response(data))
+    response.call_on_close(lambda: delete_icons(released))
+    return response
 
 
 # Allergy Routes
@@ -239,10 +375,6 @@ def delete_user(current_user_id, user_id):
 @token_required
 @authorize_user
 def add_allergy_for_user(current_user_id, user_id):
-    user = User.query.get(user_id)
-    if user is None:
-        return failure_response("User not found")
-
     body = request.get_json(silent=True)
 
     if not body or not body.get('allergy_name'):
@@ -258,22 +390,75 @@ def add_allergy_for_user(current_user_id, user_id):
         user_id=user_id
     )
     db.session.add(new_allergy)
+    add_icon_refs([(name, category)], 'allergy')
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
     db.session.commit()
 
-    if not body.get('skip_icon'):
-        generate_icon(name, category, 'allergy')
+    data = new_allergy.to_dict()
+    # Icons already in storage need no job
+    if not body.get('skip_icon') and missing_icon_pairs([(name, category)], 'allergy'):
+        data['icon_job_id'] = enqueue_icon(name, category, 'allergy', user_id).id
+
+    return success_response(data, 201)
+
 
-    return success_response(new_allergy.to_dict(), 201)
+@app.route('/api/users/<int:user_id>/allergies/bulk/', methods=['POST'])
+@token_required
+@authorize_user
+def add_allergies_bulk(current_user_id, user_id):
+    body = request.get_json(silent=True)
+    items = get_bulk_items(body)
+    if items is None:
+        return failure_response(f"items must be a list of 1-{app.config['MAX_BULK_ITEMS']} allergies", 400)
+
+    rows = []
+    icon_pairs = []
+    for index, item in enumerate(items):
+        invalid = invalid_bulk_fields(item, ('allergy_name', 'allergy_category'))
+        if invalid:
+            return failure_response(f"Invalid {', '.join(invalid)}: names and categories must be strings (item {index})", 400)
+        name = (item.get('allergy_name') or '').strip().lower()
+        category = (item.get('allergy_category') or '').strip().lower()
+        if not name:
+            return failure_response(f'Allergy name is required (item {index})', 400)
+        if len(name) > 100 or len(category) > 50:
+            return failure_response(f'Allergy name or category too long (item {index})', 400)
+
+        rows.append({'allergy_name': name, 'allergy_category': category, 'user_id': user_id})
+        if not (body.get('skip_icon') or item.get('skip_icon')):
+            icon_pairs.append((name, category))
+
+    # Storage checks happen before the transaction so it stays short
+    icon_pairs = missing_icon_pairs(icon_pairs, 'allergy')
+
+    new_allergies = db.session.scalars(insert(Allergy).returning(Allergy), rows).all()
+    add_icon_refs([(row['allergy_name'], row['allergy_category']) for row in rows], 'allergy')
+    jobs = enqueue_icons(icon_pairs, 'allergy', user_id, commit=False)
+    db.session.flush()
+
+    job_ids = {pair: job.id for pair, job in zip(icon_pairs, jobs)}
+    data = []
+    for allergy in new_allergies:
+        entry = allergy.to_dict()
+        job_id = job_ids.get((allergy.allergy_name, allergy.allergy_category))
+        if job_id is not None:
+            entry['icon_job_id'] = job_id
+        data.append(entry)
+
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
+    db.session.commit()
+    if jobs:
+        icon_worker.wake()
+
+    return success_response(data, 201)
 
 
 @app.route('/api/users/<int:user_id>/allergies/<int:allergy_id>/', methods=['PUT'])
 @token_required
 @authorize_user
 def update_allergy_for_user(current_user_id, user_id, allergy_id):
-    user = User.query.get(user_id)
-    if user is None:
-        return failure_response("User not found")
-
     allergy = Allergy.query.filter_by(id=allergy_id, user_id=user_id).first()
     if allergy is None:
         return failure_response("Allergy not found")
@@ -291,24 +476,31 @@ def update_allergy_for_user(current_user_id, user_id, allergy_id):
     
     allergy.allergy_name = new_name
     allergy.allergy_category = new_category
+
+    icon_changed = new_name != old_name or new_category != old_category
+    released = []
+    if icon_changed:
+        add_icon_refs([(new_name, new_category)], 'allergy')
+        released = release_icon_refs([(old_name, old_category)], 'allergy')
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
     db.session.commit()
 
-    if new_name != old_name or new_category != old_category:
-        cleanup_icon_if_unused(old_name, old_category, 'allergy', Allergy, 'allergy_name')
+    data = allergy.to_dict()
+
+    if icon_changed:
+        delete_icons(released)
         delete_user_scan_icon(user_id, old_name, old_category, 'allergies')
-        generate_icon(new_name, new_category, 'allergy')
+        if missing_icon_pairs([(new_name, new_category)], 'allergy'):
+            data['icon_job_id'] = enqueue_icon(new_name, new_category, 'allergy', user_id).id
 
-    return success_response(allergy.to_dict())
+    return success_response(data)
 
 
 @app.route('/api/users/<int:user_id>/allergies/<int:allergy_id>/', methods=['DELETE'])
 @token_required
 @authorize_user
 def delete_allergy_for_user(current_user_id, user_id, allergy_id):
-    user = User.query.get(user_id)
-    if user is None:
-        return failure_response("User not found")
-    
     allergy = Allergy.query.filter_by(id=allergy_id, user_id=user_id).first()
     if allergy is None:
         return failure_response("Allergy not found")
@@ -318,9 +510,12 @@ def delete_allergy_for_user(current_user_id, user_id, allergy_id):
 
     # Delete the allergy
     db.session.delete(allergy)
+    released = release_icon_refs([(name, category)], 'allergy')
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
     db.session.commit()
 
-    cleanup_icon_if_unused(name, category, 'allergy', Allergy, 'allergy_name')
+    delete_icons(released)
 
     # Always delete this user's personal scan icon
     delete_user_scan_icon(user_id, name, category, 'allergies')
@@ -332,12 +527,9 @@ def delete_allergy_for_user(current_user_id, user_id, allergy_id):
 @token_required
 @authorize_user
 def get_allergies_for_user(current_user_id, user_id):
-    user = User.query.get(user_id)
-    if not user:
-        return failure_response('User not found')
-
-    allergies = Allergy.query.filter_by(user_id=user_id).all()
-    return success_response([allergy.to_dict() for allergy in allergies])
+    return cached_user_read(user_id, 'allergies', lambda: [
+        allergy.to_dict() for allergy in Allergy.query.filter_by(user_id=user_id).all()
+    ])
 
 
 # Ingredient Routes
@@ -345,10 +537,6 @@ def get_allergies_for_user(current_user_id, user_id):
 @token_required
 @authorize_user
 def add_ingredient(current_user_id, user_id):
-    user = User.query.get(user_id)
-    if user is None:
-        return failure_response("User not found")
-
     body = request.get_json(silent=True)
     
     if not body or not body.get('name'):
@@ -366,23 +554,87 @@ def add_ingredient(current_user_id, user_id):
         user_id=user_id,
     )
     db.session.add(new_ingredient)
+    add_icon_refs([(name, category)], 'ingredient')
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
     db.session.commit()
 
-    if not body.get('skip_icon'):
-        generate_icon(name, category, 'ingredient')
+    data = new_ingredient.to_dict()
+    # Icons already in storage need no job
+    if not body.get('skip_icon') and missing_icon_pairs([(name, category)], 'ingredient'):
+        data['icon_job_id'] = enqueue_icon(name, category, 'ingredient', user_id).id
+
+    return success_response(data, 201)
+
+
+@app.route('/api/users/<int:user_id>/ingredients/bulk/', methods=['POST'])
+@token_required
+@authorize_user
+def add_ingredients_bulk(current_user_id, user_id):
+    body = request.get_json(silent=True)
+    items = get_bulk_items(body)
+    if items is None:
+        return failure_response(f"items must be a list of 1-{app.config['MAX_BULK_ITEMS']} ingredients", 400)
+
+    rows = []
+    icon_pairs = []
+    for index, item in enumerate(items):
+        invalid = invalid_bulk_fields(item, ('name', 'category', 'unit'), ('quantity',))
+        if invalid:
+            return failure_response(
+                f"Invalid {', '.join(invalid)}: name, category and unit must be strings, quantity a number (item {index})", 400
+            )
+        name = (item.get('name') or '').strip().lower()
+        category = (item.get('category') or '').strip().lower()
+        unit = item.get('unit', 'units')
+        if not name:
+            return failure_response(f'Ingredient name is required (item {index})', 400)
+        if len(name) > 100 or len(category) > 50 or (unit and len(unit) > 20):
+            return failure_response(f'Ingredient name, category or unit too long (item {index})', 400)
+
+        rows.append({
+            'name': name,
+            'quantity': item.get('quantity', 0),
+            'unit': unit,
+            'category': category,
+            'user_id': user_id,
+        })
+        if not (body.get('skip_icon') or item.get('skip_icon')):
+            icon_pairs.append((name, category))
+
+    # Storage checks happen before the transaction so it stays short
+    icon_pairs = missing_icon_pairs(icon_pairs, 'ingredient')
+
+    new_ingredients = db.session.scalars(insert(Ingredient).returning(Ingredient), rows).all()
+    add_icon_refs([(row['name'], row['category']) for row in rows], 'ingredient')
+    jobs = enqueue_icons(icon_pairs, 'ingredient', user_id, commit=False)
+    db.session.flush()
+
+    job_ids = {pair: job.id for pair, job in zip(icon_pairs, jobs)}
+    data = []
+    for ingredient in new_ingredients:
+        entry = ingredient.to_dict()
+        job_id = job_ids.get((ingredient.name, ingredient.category))
+        if job_id is not None:
+            entry['icon_job_id'] = job_id
+        data.append(entry)
+
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
+    db.session.commit()
+    if jobs:
+        icon_worker.wake()
 
-    return success_response(new_ingredient.to_dict(), 201)
+    return success_response(data, 201)
 
 
 @app.route('/api/users/<int:user_id>/ingredients/')
 @token_required
 @authorize_user
 def get_user_ingredients(current_user_id, user_id):
-    if User.query.get(user_id) is None:
-        return failure_response("User not found")
-    
-    ingredients = Ingredient.query.filter_by(user_id=user_id).all()
-    return success_response([ingredient.to_dict() for ingredient in ingredients])
+    return cached_user_read(user_id, 'ingredients', lambda: [
+        ingredient.to_dict() for ingredient in Ingredient.query.filter_by(user_id=user_id).all()
+    ])
 
 
 @app.route('/api/users/<int:user_id>/ingredients/<int:ingredient_id>/')
@@ -393,18 +645,15 @@ def get_ingredient(current_user_id, user_id, ingredient_id):
 
     if ingredient is None:
         return failure_response("Ingredient not found or does not belong to user")
-    
-    return success_response(ingredient.to_dict())
+
+    etag = f"ingredient-{ingredient.id}-{ingredient.updated_at.timestamp()}" if ingredient.updated_at else None
+    return success_response(ingredient.to_dict(), etag=etag)
 
 
 @app.route('/api/users/<int:user_id>/ingredients/<int:ingredient_id>/', methods=['PUT'])
 @token_required
 @authorize_user
 def update_ingredient(current_user_id, user_id, ingredient_id):
-    user = User.query.get(user_id)
-    if user is None:
-        return failure_response("User not found")
-
     ingredient = Ingredient.query.filter_by(id=ingredient_id, user_id=user_id).first()
     if ingredient is None:
         return failure_response("Ingredient not found")
@@ -425,25 +674,30 @@ def update_ingredient(current_user_id, user_id, ingredient_id):
     ingredient.category = new_category
     ingredient.quantity = body.get('quantity', ingredient.quantity)
     ingredient.unit = body.get('unit', ingredient.unit)
-    
+
+    icon_changed = new_name != old_name or new_category != old_category
+    released = []
+    if icon_changed:
+        add_icon_refs([(new_name, new_category)], 'ingredient')
+        released = release_icon_refs([(old_name, old_category)], 'ingredient')
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
     db.session.commit()
 
-    if new_name != old_name or new_category != old_category:
-        cleanup_icon_if_unused(old_name, old_category, 'ingredient', Ingredient, 'name')
+    data = ingredient.to_dict()
+    if icon_changed:
+        delete_icons(released)
         delete_user_scan_icon(user_id, old_name, old_category, 'ingredients')
-        generate_icon(new_name, new_category, 'ingredient')
+        if missing_icon_pairs([(new_name, new_category)], 'ingredient'):
+            data['icon_job_id'] = enqueue_icon(new_name, new_category, 'ingredient', user_id).id
 
-    return success_response(ingredient.to_dict(), 200)
+    return success_response(data, 200)
 
 
 @app.route('/api/users/<int:user_id>/ingredients/<int:ingredient_id>/', methods=['DELETE'])
 @token_required
 @authorize_user
 def delete_ingredient(current_user_id, user_id, ingredient_id):
-    user = User.query.get(user_id)
-    if user is None:
-        return failure_response("User not found")
-    
     ingredient = Ingredient.query.filter_by(id=ingredient_id, user_id=user_id).first()
     if not ingredient:
         return failure_response("Ingredient not found")
@@ -453,9 +707,12 @@ def delete_ingredient(current_user_id, user_id, ingredient_id):
     
     # Delete the ingredient
     db.session.delete(ingredient)
+    released = release_icon_refs([(ingredient_name, ingredient_category)], 'ingredient')
+    recipe_cache.invalidate_user(user_id)
+    user_cache.bump(user_id)
     db.session.commit()
     
-    cleanup_icon_if_unused(ingredient_name, ingredient_category, 'ingredient', Ingredient, 'name')
+    delete_icons(released)
 
     # Always delete this user's personal scan icon
     delete_user_scan_icon(user_id, ingredient_name, ingredient_category, 'ingredients')
@@ -464,50 +721,196 @@ def delete_ingredient(current_user_id, user_id, ingredient_id):
 
 
 # Asset Serving Routes
+# 'stream' proxies icon bodies with ETag/304 support; 'redirect' sends the browser to the CDN
+ASSET_DELIVERY = os.getenv('ASSET_DELIVERY', 'stream').lower()
+ASSET_MAX_AGE = int(os.getenv('ASSET_MAX_AGE_SECONDS', '3600'))
+ASSET_REDIRECT_MAX_AGE = int(os.getenv('ASSET_REDIRECT_MAX_AGE_SECONDS', '300'))
+# Local icons: with a prefix, nginx serves the file from an internal location via X-Accel-Redirect
+LOCAL_ASSET_ACCEL_PREFIX = os.getenv('LOCAL_ASSET_ACCEL_PREFIX', '').rstrip('/')
+# Lets Apache/lighttpd (mod_xsendfile) send local files for send_file
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+
+
 @app.route('/api/assets/<string:asset_type>/generated_images/<string:combined>')
 def get_generated_image(asset_type, combined):
     """Serve generated icons (SVG from Claude or PNG scan icons) from cloud or local storage."""
     if asset_type not in ('ingredients', 'allergies'):
         return '', 404
 
+    base_key = f"{asset_type}/generated_images/{combined}"
+    # Near-duplicate names reuse an existing icon (see find_icon_match); an
+    # alias has no file of its own, so resolve it before probing storage
+    target = resolve_icon_alias(base_key)
+    response = serve_generated_asset(target or base_key)
+    return response if response is not None else ('', 404)
+
+
+def serve_generated_asset(base_key):
+    """Response for the icon stored under base_key, or None if there is none."""
     if storage.use_cloud:
-        for ext, ct in [('.svg', 'image/svg+xml'), ('.png', 'image/png')]:
-            r = requests.get(storage.get_url(f"{asset_type}/generated_images/{combined}{ext}"))
+        if ASSET_DELIVERY == 'redirect':
+            return redirect_to_cloud_asset(base_key)
+        return stream_cloud_asset(base_key)
+    if isinstance(storage, LocalStorage):
+        return send_local_asset(base_key)
+    return send_stored_asset(base_key)
+
+
+def asset_cache_control(ext):
+    """Generated SVG icons never change; per-user scan icons (PNG) are replaced under the same key."""
+    if ext == '.png':
+        return 'no-cache'
+    return f'public, max-age={ASSET_MAX_AGE}'
+
+
+def asset_extensions_to_try(base_key):
+    """Extensions to request for an icon, best guess first; empty if it is known to be missing."""
+    found, ext, _ = asset_index.lookup(base_key)
+    if found and ext is None:
+        return []
+    extensions = [e for e, _ in ASSET_EXTENSIONS]
+    if ext:
+        extensions.remove(ext)
+        extensions.insert(0, ext)
+    return extensions
+
+
+def send_local_asset(base_key):
+    found, ext, _ = asset_index.lookup(base_key)
+    if not found:
+        ext = storage.find_extension(base_key, [e for e, _ in ASSET_EXTENSIONS])
+        asset_index.remember(base_key, ext)
+    if ext is None:
+        return None
+
+    key = f"{base_key}{ext}"
+    if LOCAL_ASSET_ACCEL_PREFIX:
+        return Response(status=200, headers={
+            'X-Accel-Redirect': f"{LOCAL_ASSET_ACCEL_PREFIX}/{key}",
+            'Content-Type': dict(ASSET_EXTENSIONS)[ext],
+            'Cache-Control': asset_cache_control(ext),
+        })
+
+    # send_file adds ETag/Last-Modified, answers revalidations itself and hands
+    # the file to the server's sendfile; without max_age it sends no-cache
+    try:
+        return send_file(
+            storage.path(key),
+            mimetype=dict(ASSET_EXTENSIONS)[ext],
+            max_age=None if ext == '.png' else ASSET_MAX_AGE,
+        )
+    except FileNotFoundError:
+        # Deleted since it was indexed; look again next time
+        asset_index.forget(key)
+        return None
+
+
+def send_stored_asset(base_key):
+    """Icon body read through the storage interface (the in-memory backend)."""
+    for ext, content_type in ASSET_EXTENSIONS:
+        stored = storage.read(f"{base_key}{ext}")
+        if stored is not None:
+            response = Response(stored[0], 200, headers={
+                'Content-Type': content_type,
+                'Cache-Control': asset_cache_control(ext),
+            })
+            response.add_etag()
+            return response.make_conditional(request)
+    return None
+
+
+def redirect_to_cloud_asset(base_key):
+    found, ext, _ = asset_index.lookup(base_key)
+    if not found:
+        for candidate in asset_extensions_to_try(base_key):
+            r = clients.http_head(storage.get_url(f"{base_key}{candidate}"))
             if r.status_code == 200:
-                return r.content, 200, {'Content-Type': ct, 'Cache-Control': 'no-cache'}
-    else:
-        for ext in ('.svg', '.png'):
-            path = os.path.join('ingredient_icon_generator', 'assets',
-                                asset_type, 'generated_images', f"{combined}{ext}")
-            if os.path.exists(path):
-                return send_from_directory(
-                    f'ingredient_icon_generator/assets/{asset_type}/generated_images',
-                    f"{combined}{ext}"
-                )
+                ext = candidate
+                break
+        asset_index.remember(base_key, ext, r.headers.get('ETag') if ext else None)
+
+    if ext is None:
+        return None
+
+    response = redirect(storage.get_url(f"{base_key}{ext}"), 302)
+    response.headers['Cache-Control'] = (
+        asset_cache_control(ext) if ext == '.png' else f'public, max-age={ASSET_REDIRECT_MAX_AGE}'
+    )
+    return response
+
+
+def stream_cloud_asset(base_key):
+    # Answer revalidations from the index without touching the CDN. Not for
+    # scan icons: another worker may have replaced them since they were indexed
+    found, ext, etag = asset_index.lookup(base_key)
+    if found and etag and ext != '.png' and request.if_none_match.contains_raw(etag):
+        return '', 304, {'ETag': etag, 'Cache-Control': asset_cache_control(ext)}
+
+    conditional = {}
+    if request.headers.get('If-None-Match'):
+        conditional['If-None-Match'] = request.headers['If-None-Match']
+
+    for ext in asset_extensions_to_try(base_key):
+        r = clients.http_get(storage.get_url(f"{base_key}{ext}"), headers=conditional, stream=True)
+        if r.status_code not in (200, 304):
+            r.close()
+            continue
+
+        etag = r.headers.get('ETag')
+        asset_index.remember(base_key, ext, etag)
+        headers = {'Cache-Control': asset_cache_control(ext)}
+        if etag:
+            headers['ETag'] = etag
 
-    return '', 404
+        if r.status_code == 304:
+            r.close()
+            return '', 304, headers
+
+        headers['Content-Type'] = dict(ASSET_EXTENSIONS)[ext]
+        if r.headers.get('Content-Length'):
+            headers['Content-Length'] = r.headers['Content-Length']
+        response = Response(r.iter_content(chunk_size=16384), 200, headers=headers)
+        response.call_on_close(r.close)
+        return response
+
+    asset_index.remember(base_key, None)
+    return None
+
+
+@app.route('/api/icon-jobs/<int:job_id>/')
+@token_required
+def get_icon_job(current_user_id, job_id):
+    job = db.session.get(IconJob, job_id)
+    # Other users' jobs look the same as missing ones
+    if job is None or job.user_id != current_user_id:
+        return failure_response("Icon job not found")
+
+    return success_response(job.to_dict())
 
 
 # Search Route
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', '50'))
+INGREDIENT_SEARCH_MAX_LIMIT = 500
+
+
 @app.route('/api/users/<int:user_id>/ingredients/search/')
 @token_required
 @authorize_user
 def search_ingredients(current_user_id, user_id):
-    if User.query.get(user_id) is None:    # Check if user exists
-        return failure_response("User not found")
-    
     query = request.args.get('q', '')
     category = request.args.get('category')
-    
-    ingredients_query = Ingredient.query.filter_by(user_id=user_id)
-    
-    if query:
-        ingredients_query = ingredients_query.filter(Ingredient.name.like(f'%{query}%'))
-    
-    if category:
-        ingredients_query = ingredients_query.filter_by(category=category)
-    
-    ingredients = ingredients_query.all()
+
+    # Typeahead results are capped; without q the whole list is returned unless limit is given
+    default_limit = INGREDIENT_SEARCH_LIMIT if query.strip() else None
+    try:
+        limit = int(request.args['limit']) if request.args.get('limit') else default_limit
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return failure_response('limit and offset must be numbers', 400)
+    if limit is not None:
+        limit = max(1, min(limit, INGREDIENT_SEARCH_MAX_LIMIT))
+
+    ingredients = ingredient_search.search(user_id, query, category, limit=limit, offset=offset)
     return success_response([ingredient.to_dict() for ingredient in ingredients])
 
 
@@ -544,59 +947,144 @@ def logout():
 @token_required
 @authorize_user
 def get_recipe_suggestions(current_user_id, user_id):
-    user = User.query.get(user_id)
-
-    if user is None:
-        return failure_response("User not found")
-    
-    ingredients = Ingredient.query.filter_by(user_id=user_id).all()
-    allergies = Allergy.query.filter_by(user_id=user_id).all()
+    # Stable ordering keeps the prompt (and so the cache key) identical between calls
+    ingredients = Ingredient.query.filter_by(user_id=user_id).order_by(Ingredient.id).all()
+    allergies = Allergy.query.filter_by(user_id=user_id).order_by(Allergy.id).all()
     
     if not ingredients:
         return failure_response('No ingredients found for this user')
     
-    # Optional filters — whitelist to prevent prompt injection
-    VALID_MEAL_TYPES = {'breakfast', 'lunch', 'dinner', 'snack', 'dessert'}
-    VALID_CUISINES = {'american', 'italian', 'mexican', 'chinese', 'indian', 'french', 'japanese'}
-    VALID_DIETS = {'vegetarian', 'vegan', 'gluten-free', 'keto', 'pescatarian'}
-
-    raw_meal_type = request.args.get('meal_type', '').strip().lower()
-    raw_cuisine = request.args.get('cuisine', '').strip().lower()
-    raw_diet = request.args.get('diet', '').strip().lower()
+    filters = get_recipe_filters()
 
-    meal_type = raw_meal_type if raw_meal_type in VALID_MEAL_TYPES else ''
-    cuisine = raw_cuisine if raw_cuisine in VALID_CUISINES else ''
-    diet = raw_diet if raw_diet in VALID_DIETS else ''
-    
     # 🔹 Use helper function
     prompt = build_recipe_prompt(
         ingredients=ingredients,
         allergies=allergies,
-        meal_type=meal_type,
-        cuisine=cuisine,
-        diet=diet
+        **filters
     )
 
-    try:
-        client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-        response = client.messages.create(
-            model="claude-haiku-4-5",
-            max_tokens=2048,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        recipes = response.content[0].text
-        return success_response({
-            'ingredients_used': [i.name for i in ingredients],
-            'recipes': recipes,
-            'filters': {
-                'meal_type': meal_type,
-                'cuisine': cuisine,
-                'diet': diet
-            }
+    cache_key = recipe_cache.make_key(f"{RECIPE_INSTRUCTIONS}\n{prompt}", RECIPE_MODEL)
+    refresh = request.args.get('refresh', '').lower() == 'true'
+
+    recipes = None if refresh else recipe_cache.get(cache_key)
+    cached = recipes is not None
+    ingredients_used = [i.name for i in ingredients]
+
+    if not cached:
+        # Hand the pooled DB connection back while waiting on the model
+        db.session.close()
+        try:
+            response = ai.create_message(
+                'recipes',
+                model=RECIPE_MODEL,
+                max_tokens=2048,
+                system=cached_system_prompt(RECIPE_INSTRUCTIONS),
+                messages=[{"role": "user", "content": prompt}]
+            )
+            recipes = response_text(response)
+        except Exception:
+            return failure_response('Error generating recipes', 500)
+
+        recipe_cache.set(cache_key, user_id, recipes)
+
+    return success_response({
+        'ingredients_used': ingredients_used,
+        'recipes': recipes,
+        'cached': cached,
+        'filters': filters
+    })
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/api/users/<int:user_id>/recipe-suggestions/stream/')
+@token_required
+@authorize_user
+def stream_recipe_suggestions(current_user_id, user_id):
+    """Same as get_recipe_suggestions, but streams the recipes as Server-Sent Events."""
+    ingredients = Ingredient.query.filter_by(user_id=user_id).order_by(Ingredient.id).all()
+    allergies = Allergy.query.filter_by(user_id=user_id).order_by(Allergy.id).all()
+
+    if not ingredients:
+        return failure_response('No ingredients found for this user')
+
+    filters = get_recipe_filters()
+    prompt = build_recipe_prompt(ingredients=ingredients, allergies=allergies, **filters)
+
+    cache_key = recipe_cache.make_key(f"{RECIPE_INSTRUCTIONS}\n{prompt}", RECIPE_MODEL)
+    refresh = request.args.get('refresh', '').lower() == 'true'
+    cached_recipes = None if refresh else recipe_cache.get(cache_key)
+    ingredients_used = [i.name for i in ingredients]
+
+    def generate():
+        yield sse_event('meta', {
+            'ingredients_used': ingredients_used,
+            'filters': filters,
+            'cached': cached_recipes is not None,
         })
-    except Exception:
-        return failure_response('Error generating recipes', 500)
-    
+
+        if cached_recipes is not None:
+            yield sse_event('delta', {'text': cached_recipes})
+            yield sse_event('done', {})
+            return
+
+        chunks = []
+        db.session.close()
+        try:
+            # Closing this generator (GeneratorExit at a yield when the client
+            # disconnects) closes the upstream response and stops generation.
+            for chunk in ai.stream_text(
+                'recipes',
+                model=RECIPE_MODEL,
+                max_tokens=2048,
+                system=cached_system_prompt(RECIPE_INSTRUCTIONS),
+                messages=[{"role": "user", "content": prompt}]
+            ):
+                chunks.append(chunk)
+                yield sse_event('delta', {'text': chunk})
+        except Exception:
+            yield sse_event('error', {'error': 'Error generating recipes'})
+            return
+
+        recipe_cache.set(cache_key, user_id, ''.join(chunks))
+        yield sse_event('done', {})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+RECIPE_MODEL = "claude-haiku-4-5"
+
+# Fixed instructions sent as a cached system prompt; build_recipe_prompt adds the per-user part
+RECIPE_INSTRUCTIONS = (
+    "Suggest a few recipes using the user's ingredients. "
+    "For each recipe provide: a name, ingredient list with quantities, step-by-step instructions, "
+    "and a nutritional estimate per serving formatted exactly as: "
+    "**Nutrition (per serving):** ~X cal | Xg protein | Xg carbs | Xg fat. "
+    "Do not ask follow-up questions or suggest modifications at the end."
+)
+
+# Optional filters — whitelist to prevent prompt injection
+VALID_MEAL_TYPES = {'breakfast', 'lunch', 'dinner', 'snack', 'dessert'}
+VALID_CUISINES = {'american', 'italian', 'mexican', 'chinese', 'indian', 'french', 'japanese'}
+VALID_DIETS = {'vegetarian', 'vegan', 'gluten-free', 'keto', 'pescatarian'}
+
+
+def get_recipe_filters():
+    raw_meal_type = request.args.get('meal_type', '').strip().lower()
+    raw_cuisine = request.args.get('cuisine', '').strip().lower()
+    raw_diet = request.args.get('diet', '').strip().lower()
+
+    return {
+        'meal_type': raw_meal_type if raw_meal_type in VALID_MEAL_TYPES else '',
+        'cuisine': raw_cuisine if raw_cuisine in VALID_CUISINES else '',
+        'diet': raw_diet if raw_diet in VALID_DIETS else '',
+    }
+
 
 def build_recipe_prompt(ingredients, allergies, meal_type=None, cuisine=None, diet=None):
     # Ingredient descriptions
@@ -613,7 +1101,6 @@ def build_recipe_prompt(ingredients, allergies, meal_type=None, cuisine=None, di
         ingredient_descriptions.append(desc)
 
     prompt = f"I have the following ingredients: {', '.join(ingredient_descriptions)}."
-    prompt += " Suggest a few recipes using these ingredients."
 
     # Allergies
     if allergies:
@@ -633,16 +1120,60 @@ def build_recipe_prompt(ingredients, allergies, meal_type=None, cuisine=None, di
     if diet:
         prompt += f" The recipes should follow a {diet} diet."
 
-    prompt += " For each recipe provide: a name, ingredient list with quantities, step-by-step instructions, and a nutritional estimate per serving formatted exactly as: **Nutrition (per serving):** ~X cal | Xg protein | Xg carbs | Xg fat. Do not ask follow-up questions or suggest modifications at the end."
-
     return prompt
 
 
+def user_scan_icon_key(user_id, name, category, asset_type):
+    combined = f"{name}_{category}" if category else name
+    return f"{asset_type}/generated_images/{user_id}_{combined}.png"
+
+
 def delete_user_scan_icon(user_id, name, category, asset_type):
     """Delete the user-specific scan icon from storage, if it exists."""
-    combined = f"{name}_{category}" if category else name
-    key = f"{asset_type}/generated_images/{user_id}_{combined}.png"
-    storage.delete(key)
+    storage.delete(user_scan_icon_key(user_id, name, category, asset_type))
+
+
+# Raw-body uploads above this size are spooled to a temporary file instead of memory
+UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', str(1024 * 1024)))
+
+
+def image_upload():
+    """The image of a file upload as (stream, fields), or None for a JSON request.
+
+    Accepts multipart/form-data (file in the "image" part, other values as
+    form fields) or a raw image/* body (other values in the query string).
+    Werkzeug spools multipart files itself; a raw body is copied into a
+    SpooledTemporaryFile. MAX_CONTENT_LENGTH applies to both, and stream
+    is None if no image was sent.
+    """
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        return (upload.stream if upload else None), request.form
+
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        buf = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+        shutil.copyfileobj(request.stream, buf)
+        if buf.tell() == 0:
+            return None, request.args
+        buf.seek(0)
+        return buf, request.args
+
+    return None
+
+
+def decode_base64_image(image_data):
+    """Bytes of a base64 image, with or without a data URL prefix. Raises binascii.Error."""
+    # Strip data URL prefix if present (e.g. "data:image/jpeg;base64,...")
+    if ',' in image_data:
+        image_data = image_data.split(',', 1)[1]
+    return base64.b64decode(image_data, validate=True)
+
+
+def stream_size(stream):
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
 
 
 @app.route('/api/assets/<string:asset_type>/upload-icon/', methods=['POST'])
@@ -651,27 +1182,26 @@ def upload_scan_icon(current_user_id, asset_type):
     if asset_type not in ('ingredients', 'allergies'):
         return failure_response('Invalid asset type', 400)
 
-    body = request.get_json(silent=True)
-    if not body or not body.get('image') or not body.get('name'):
+    upload = image_upload()
+    if upload is not None:
+        stream, fields = upload
+    else:
+        fields = request.get_json(silent=True) or {}
+        try:
+            stream = BytesIO(decode_base64_image(fields['image'])) if fields.get('image') else None
+        except binascii.Error:
+            return failure_response('Invalid image data', 400)
+    if stream is None or not fields.get('name'):
         return failure_response('Missing required fields', 400)
 
-    name = body['name'].strip().lower()
-    category = (body.get('category') or '').strip().lower()
-    image_data = body['image']
-
-    if ',' in image_data:
-        image_data = image_data.split(',', 1)[1]
+    name = fields['name'].strip().lower()
+    category = (fields.get('category') or '').strip().lower()
 
-    combined = f"{name}_{category}" if category else name
-    key = f"{asset_type}/generated_images/{current_user_id}_{combined}.png"
+    key = user_scan_icon_key(current_user_id, name, category, asset_type)
 
     try:
-        from io import BytesIO
-
-        raw = base64.b64decode(image_data)
-        buf = BytesIO(raw)
-
-        success = storage.upload_image(buf, key, content_type='image/png')
+        # The upload is handed to storage as a stream, without another copy
+        success = storage.upload_image(stream, key, content_type='image/png', cache_control='no-cache')
         if success:
             return success_response({'key': key})
         return failure_response('Failed to upload icon', 500)
@@ -679,66 +1209,87 @@ def upload_scan_icon(current_user_id, asset_type):
         return failure_response('Error uploading icon', 500)
 
 
+SCAN_BBOX_INSTRUCTION = (
+    " Also provide a bounding box for each item as a percentage of the image dimensions. "
+    'The bbox field must be [x1_pct, y1_pct, x2_pct, y2_pct] where values are 0-100 '
+    "(percentage from left/top edges). Example: [10, 20, 40, 60] means the item occupies "
+    "from 10% to 40% horizontally and 20% to 60% vertically."
+)
+
+SCAN_INSTRUCTIONS = {
+    'allergies': (
+        "Identify all food items visible in the image you are given. "
+        "For each food item, determine if it is a common allergen or contains common allergens "
+        "(such as peanuts, tree nuts, milk/dairy, eggs, wheat/gluten, soy, fish, shellfish, sesame). "
+        "Report them with the report_items tool in this format:\n"
+        '{"items": [{"name": "item name", "category": "allergen category or empty string", "bbox": [x1_pct, y1_pct, x2_pct, y2_pct]}]}\n'
+        "Only include items that are allergens or contain allergens. "
+        "Use simple lowercase names. Category should be one of: nuts, dairy, eggs, gluten, soy, seafood, or empty string."
+        + SCAN_BBOX_INSTRUCTION
+    ),
+    'ingredients': (
+        "Identify all food items, ingredients, or produce visible in the image you are given. "
+        "Report them with the report_items tool in this format:\n"
+        '{"items": [{"name": "item name", "category": "food category or empty string", "bbox": [x1_pct, y1_pct, x2_pct, y2_pct]}]}\n'
+        "Use simple lowercase names (e.g. 'apple', 'milk', 'chicken breast'). "
+        "Category should be one of: vegetable, fruit, meat, dairy, grain, spice, condiment, frozen, or empty string."
+        + SCAN_BBOX_INSTRUCTION
+    ),
+}
+
+
 @app.route('/api/users/<int:user_id>/scan-image/', methods=['POST'])
-@limiter.limit("20 per hour")
+# Scans answered from the scan cache don't use up the hourly allowance
+@limiter.limit("20 per hour", deduct_when=lambda response: not g.get('scan_cache_hit'))
 @token_required
 @authorize_user
 def scan_image(current_user_id, user_id):
-    body = request.get_json(silent=True)
-    if not body or not body.get('image'):
+    # Multipart or raw image bodies are read as a stream; JSON carries base64
+    upload = image_upload()
+    if upload is not None:
+        stream, fields = upload
+    else:
+        fields = request.get_json(silent=True) or {}
+        stream = None
+    if stream is None and not fields.get('image'):
         return failure_response('Missing image data', 400)
 
-    scan_type = body.get('scan_type', 'ingredients')  # 'ingredients' or 'allergies'
-    image_data = body['image']
-
-    # Strip data URL prefix if present (e.g. "data:image/jpeg;base64,...")
-    if ',' in image_data:
-        image_data = image_data.split(',', 1)[1]
-
-    # Detect media type from original data URL or default to jpeg
-    media_type = 'image/jpeg'
-    if body['image'].startswith('data:'):
-        prefix = body['image'].split(';')[0]
-        media_type = prefix.split(':')[1]
+    scan_type = fields.get('scan_type', 'ingredients')  # 'ingredients' or 'allergies'
 
     anthropic_key = app.config.get('ANTHROPIC_API_KEY')
     if not anthropic_key:
         return failure_response('Anthropic API key not configured', 500)
 
+    # Shrink camera photos before sending them: less upload time and fewer input tokens
     try:
-        claude_client = anthropic.Anthropic(api_key=anthropic_key)
-
-        bbox_instruction = (
-            " Also provide a bounding box for each item as a percentage of the image dimensions. "
-            'The bbox field must be [x1_pct, y1_pct, x2_pct, y2_pct] where values are 0-100 '
-            "(percentage from left/top edges). Example: [10, 20, 40, 60] means the item occupies "
-            "from 10% to 40% horizontally and 20% to 60% vertically."
-        )
-
-        if scan_type == 'allergies':
-            prompt = (
-                "Look at this image carefully. Identify all food items visible. "
-                "For each food item, determine if it is a common allergen or contains common allergens "
-                "(such as peanuts, tree nuts, milk/dairy, eggs, wheat/gluten, soy, fish, shellfish, sesame). "
-                "Return ONLY a JSON object with this exact format, no extra text:\n"
-                '{"items": [{"name": "item name", "category": "allergen category or empty string", "bbox": [x1_pct, y1_pct, x2_pct, y2_pct]}]}\n'
-                "Only include items that are allergens or contain allergens. "
-                "Use simple lowercase names. Category should be one of: nuts, dairy, eggs, gluten, soy, seafood, or empty string."
-                + bbox_instruction
-            )
-        else:
-            prompt = (
-                "Look at this image carefully. Identify all food items, ingredients, or produce visible. "
-                "Return ONLY a JSON object with this exact format, no extra text:\n"
-                '{"items": [{"name": "item name", "category": "food category or empty string", "bbox": [x1_pct, y1_pct, x2_pct, y2_pct]}]}\n'
-                "Use simple lowercase names (e.g. 'apple', 'milk', 'chicken breast'). "
-                "Category should be one of: vegetable, fruit, meat, dairy, grain, spice, condiment, frozen, or empty string."
-                + bbox_instruction
-            )
+        if stream is None:
+            stream = BytesIO(decode_base64_image(fields['image']))
+        size_in = stream_size(stream)
+        prepared, media_type = prepare_scan_image(stream)
+    except (binascii.Error, ImageError):
+        return failure_response('Invalid image data', 400)
+    scan_image_stats.record(size_in, len(prepared))
+    app.logger.info("scan image: %d -> %d bytes", size_in, len(prepared))
+    image_data = base64.b64encode(prepared).decode('ascii')
+
+    # Rescans of the same shelf reuse the last result; ?refresh=true forces a new scan
+    scan_hash = image_hash(prepared)
+    refresh = request.args.get('refresh', '').lower() == 'true'
+    cached_items = None if refresh else scan_cache.get(user_id, scan_type, scan_hash)
+    if cached_items is not None:
+        g.scan_cache_hit = True
+        return success_response({"items": cached_items, "scan_type": scan_type, "cached": True})
+
+    # Don't hold a DB connection while waiting on the model
+    db.session.close()
 
-        response = claude_client.messages.create(
+    try:
+        response = ai.create_message(
+            'scan',
             model="claude-opus-4-6",
             max_tokens=1024,
+            # The fixed instructions (and the tool) form a cacheable prefix; only the image varies
+            system=cached_system_prompt(SCAN_INSTRUCTIONS.get(scan_type, SCAN_INSTRUCTIONS['ingredients'])),
             messages=[{
                 "role": "user",
                 "content": [
@@ -750,52 +1301,170 @@ def scan_image(current_user_id, user_id):
                             "data": image_data,
                         },
                     },
-                    {"type": "text", "text": prompt}
+                    {"type": "text", "text": "Look at this image carefully and report the items."}
                 ],
-            }]
+            }],
+            tools=[SCAN_ITEMS_TOOL],
+            tool_choice={"type": "tool", "name": SCAN_ITEMS_TOOL["name"]},
         )
 
-        text_content = next((b.text for b in response.content if b.type == "text"), "")
+        # Unusable entries are dropped instead of failing the whole scan
+        items, partial = parse_scan_items(response)
 
-        # Parse the JSON response from Claude
-        # Claude might wrap it in markdown code block
-        if "```" in text_content:
-            text_content = text_content.split("```")[1]
-            if text_content.startswith("json"):
-                text_content = text_content[4:]
+        # Empty or partial results aren't cached so a retry gets a fresh look
+        if items and not partial:
+            scan_cache.set(user_id, scan_type, scan_hash, items)
 
-        parsed = json.loads(text_content.strip())
-        items = parsed.get("items", [])
+        return success_response({"items": items, "scan_type": scan_type, "cached": False, "partial": partial})
 
-        return success_response({"items": items, "scan_type": scan_type})
-
-    except json.JSONDecodeError:
-        return failure_response('Could not parse response from Claude', 500)
     except Exception:
         return failure_response('Error scanning image', 500)
 
 
+SAVED_RECIPES_PAGE_SIZE = int(os.getenv('SAVED_RECIPES_PAGE_SIZE', '50'))
+SAVED_RECIPES_MAX_PAGE_SIZE = 200
+RECIPE_PREVIEW_CHARS = 200
+# `preview` is the start of the recipe text, read without loading the full body
+RECIPE_FIELDS = ('id', 'name', 'recipe', 'preview', 'created_at', 'updated_at', 'user_id')
+DEFAULT_RECIPE_FIELDS = ('id', 'name', 'recipe', 'created_at', 'updated_at', 'user_id')
+
+
+def encode_recipe_cursor(created_at, recipe_id):
+    raw = json.dumps([created_at.isoformat(), recipe_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_recipe_cursor(cursor):
+    """(created_at, id) of the last recipe on the previous page, or None if the cursor is invalid.
+
+    Only a cursor this server encoded is accepted: it must decode strictly
+    and encode back to the same string.
+    """
+    try:
+        raw = base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True)
+        created_at, recipe_id = json.loads(raw)
+        position = datetime.fromisoformat(created_at), recipe_id
+        if type(recipe_id) is not int or encode_recipe_cursor(*position) != cursor:
+            return None
+        return position
+    except (ValueError, TypeError):
+        return None
+
+
+def recipe_fields(recipe, fields, preview=None):
+    data = {}
+    for field in fields:
+        if field == 'preview':
+            data[field] = preview
+        elif field in ('created_at', 'updated_at'):
+            value = getattr(recipe, field)
+            data[field] = value.isoformat() if value else None
+        else:
+            data[field] = getattr(recipe, field)
+    return data
+
+
 @app.route('/api/users/<int:user_id>/saved-recipes/')
 @token_required
 @authorize_user
 def get_recipes(current_user_id, user_id):
-    if User.query.get(user_id) is None:
-        return failure_response("User not found")
-    
-    recipes = Recipe.query.filter_by(user_id=user_id).all()
+    """List saved recipes newest first, one page at a time.
+
+    ?fields= picks the fields to return (only those columns are loaded),
+    ?limit= sets the page size and ?cursor= continues from the next_cursor
+    of the previous page.
+    """
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    fields = list(dict.fromkeys(fields)) or list(DEFAULT_RECIPE_FIELDS)
+    if any(field not in RECIPE_FIELDS for field in fields):
+        return failure_response(f"fields must be a comma-separated list of: {', '.join(RECIPE_FIELDS)}", 400)
+
+    try:
+        limit = int(request.args.get('limit', SAVED_RECIPES_PAGE_SIZE))
+    except ValueError:
+        return failure_response('limit must be a number', 400)
+    limit = max(1, min(limit, SAVED_RECIPES_MAX_PAGE_SIZE))
+
+    cursor = request.args.get('cursor') or None
+    position = decode_recipe_cursor(cursor) if cursor else None
+    if cursor and position is None:
+        return failure_response('Invalid cursor', 400)
+
+    def load():
+        columns = [getattr(Recipe, field) for field in fields if field not in ('id', 'preview')]
+        query = select(Recipe).options(load_only(Recipe.created_at, *columns))
+        if 'preview' in fields:
+            query = query.add_columns(func.substr(Recipe.recipe, 1, RECIPE_PREVIEW_CHARS))
+        query = query.where(Recipe.user_id == user_id)
+        if position is not None:
+            created_at, recipe_id = position
+            query = query.where(or_(
+                Recipe.created_at < created_at,
+                and_(Recipe.created_at == created_at, Recipe.id < recipe_id),
+            ))
+        # One extra row tells whether there is a next page
+        rows = db.session.execute(
+            query.order_by(Recipe.created_at.desc(), Recipe.id.desc()).limit(limit + 1)
+        ).all()
+
+        page = rows[:limit]
+        items = [recipe_fields(row[0], fields, row[1] if len(row) > 1 else None) for row in page]
+        next_cursor = encode_recipe_cursor(page[-1][0].created_at, page[-1][0].id) if len(rows) > limit else None
+        return items, next_cursor
+
+    # Built from the decoded position so nothing from the raw query string reaches the ETag
+    after = f"{position[0].isoformat()}/{position[1]}" if position else ''
+    collection = f"recipes:{','.join(fields)}:{limit}:{after}"
+    return cached_user_read(user_id, collection, load, paged=True)
+
+
+@app.route('/api/users/<int:user_id>/saved-recipes/search/')
+@token_required
+@authorize_user
+def search_recipes(current_user_id, user_id):
+    """Full-text search of saved recipe names and bodies, best match first.
 
-    return success_response([recipe.to_dict() for recipe in recipes])
+    Each result carries an HTML-escaped snippet of the body with the matched
+    words in <mark> tags; ?limit= and ?offset= page through the results.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return failure_response('Missing search query', 400)
+
+    try:
+        limit = int(request.args.get('limit', SAVED_RECIPES_PAGE_SIZE))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return failure_response('limit and offset must be numbers', 400)
+    limit = max(1, min(limit, SAVED_RECIPES_MAX_PAGE_SIZE))
+
+    def load():
+        return [
+            {**recipe_fields(recipe, ('id', 'name', 'created_at', 'updated_at', 'user_id')), 'snippet': snippet}
+            for recipe, snippet in recipe_search.search(user_id, query, limit, offset)
+        ]
+
+    # The collection name becomes part of the ETag, which can't hold the raw query (e.g. quotes)
+    query_hash = hashlib.sha1(query.encode('utf-8')).hexdigest()
+    return cached_user_read(user_id, f"recipe-search:{limit}:{offset}:{query_hash}", load)
+
+
+@app.route('/api/users/<int:user_id>/saved-recipes/<int:recipe_id>')
+@token_required
+@authorize_user
+def get_recipe(current_user_id, user_id, recipe_id):
+    recipe = Recipe.query.filter_by(id=recipe_id, user_id=user_id).first()
+    if recipe is None:
+        return failure_response("Recipe not found")
+
+    changed_at = recipe.updated_at or recipe.created_at
+    return success_response(recipe.to_dict(), etag=f"recipe-{recipe.id}-{changed_at.timestamp()}")
 
 
 @app.route('/api/users/<int:user_id>/saved-recipes/', methods=['POST'])
 @token_required
 @authorize_user
 def save_recipe(current_user_id, user_id):
-    user = User.query.get(user_id)
-
-    if user is None:
-        return failure_response("User not found")
-    
     body = request.get_json(silent=True)
     
     if body is None or 'recipe' not in body:
@@ -811,6 +1480,7 @@ def save_recipe(current_user_id, user_id):
     )
 
     db.session.add(new_recipe)
+    user_cache.bump(user_id)
     db.session.commit()
 
     return success_response(new_recipe.to_dict(), 201)
@@ -820,10 +1490,6 @@ def save_recipe(current_user_id, user_id):
 @token_required
 @authorize_user
 def rename_recipe(current_user_id, user_id, recipe_id):
-    user = User.query.get(user_id)
-    if not user:
-        return failure_response("User not found", 404)
-
     recipe = Recipe.query.filter_by(id=recipe_id, user_id=user_id).first()
     if recipe is None:
         return failure_response("Recipe not found", 404)
@@ -832,6 +1498,7 @@ def rename_recipe(current_user_id, user_id, recipe_id):
     new_name = body.get('name', '')
 
     recipe.name = new_name
+    user_cache.bump(user_id)
     db.session.commit()
 
     return success_response(recipe.to_dict())
@@ -841,22 +1508,64 @@ def rename_recipe(current_user_id, user_id, recipe_id):
 @token_required
 @authorize_user
 def delete_recipe(current_user_id, user_id, recipe_id):
-    user = User.query.get(user_id)
-
-    if user is None:
-        return failure_response("User not found")
-    
     recipe = Recipe.query.filter_by(id=recipe_id, user_id=user_id).first()
 
     if recipe is None:
         return failure_response("Recipe not found")
     
     db.session.delete(recipe)
+    user_cache.bump(user_id)
     db.session.commit()
 
     return success_response(recipe.to_dict())
     
 
+@app.cli.command('reconcile-icons')
+def reconcile_icons():
+    """Rebuild the icon manifest from the bucket listing and current reference counts."""
+    stored_keys = list_stored_icon_keys()
+    rows = rebuild_icon_manifest(stored_keys)
+    unused = sum(1 for row in rows.values() if row['ref_count'] == 0)
+    missing = sum(1 for row in rows.values() if not row['stored'])
+    print(f"{len(rows)} icons in manifest: {len(stored_keys)} stored, {unused} unused, {missing} missing")
+
+
+@app.cli.command('warm-icons')
+@click.option('--seeds', default=DEFAULT_SEEDS_PATH, show_default=True, help='JSON seed list of (name, category) pairs.')
+@click.option('--concurrency', default=4, show_default=True, help='Icons generated in parallel.')
+@click.option('--max-attempts', default=5, show_default=True, help='Attempts per icon when rate limited.')
+def warm_icons(seeds, concurrency, max_attempts):
+    """Pre-generate icons for common ingredients and allergens. Safe to re-run."""
+    results = warm_icon_catalog(app, load_seeds(seeds), concurrency=concurrency, max_attempts=max_attempts)
+    print(f"{results['generated']} generated, {results['failed']} failed")
+
+
+@app.cli.command('icon-worker')
+def run_icon_worker():
+    """Process queued icon jobs in the foreground."""
+    icon_worker.run_forever()
+
+
+# /metrics is disabled unless METRICS_TOKEN is set; scrapers send it as a Bearer token
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+
+@app.route('/metrics')
+def metrics():
+    if not METRICS_TOKEN:
+        return failure_response('Not found', 404)
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode('utf-8'), METRICS_TOKEN.encode('utf-8')):
+        return failure_response('Unauthorized', 401)
+
+    return jsonify({
+        'pools': clients.stats(),
+        'scan_images': scan_image_stats.snapshot(),
+        'ai_usage': ai.usage_stats(),
+        'db_queries': query_counter.snapshot(),
+    }), 200
+
+
 # Health Check Endpoint
 @app.route('/health')
 def health():
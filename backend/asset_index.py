@@ -0,0 +1,67 @@
+# asset_index.py
+import os
+import threading
+import time
+
+ASSET_EXTENSIONS = (('.svg', 'image/svg+xml'), ('.png', 'image/png'))
+
+
+class AssetIndex:
+    """Remembers which extension (and ETag) an icon was last found under.
+
+    Entries expire after a TTL so changes made by other worker processes are
+    picked up; misses are remembered for a much shorter time because a
+    pending icon can appear at any moment.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv('ASSET_INDEX_TTL_SECONDS', '300'))
+        self.miss_ttl = float(os.getenv('ASSET_INDEX_MISS_TTL_SECONDS', '5'))
+        self._lock = threading.Lock()
+        self._entries = {}  # base key -> (expires_at, ext or None, etag)
+        self._aliases = {}  # base key -> (expires_at, target base key or None)
+
+    def lookup(self, base_key):
+        """Return (found, ext, etag); found is False when nothing is remembered."""
+        with self._lock:
+            entry = self._entries.get(base_key)
+            if entry is None:
+                return False, None, None
+            if entry[0] <= time.monotonic():
+                del self._entries[base_key]
+                return False, None, None
+            return True, entry[1], entry[2]
+
+    def remember(self, base_key, ext, etag=None):
+        ttl = self.ttl if ext else self.miss_ttl
+        with self._lock:
+            self._entries[base_key] = (time.monotonic() + ttl, ext, etag)
+
+    def lookup_alias(self, base_key):
+        """Return (found, target) for an icon key that reuses another icon's file."""
+        with self._lock:
+            entry = self._aliases.get(base_key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._aliases[base_key]
+                return False, None
+            return True, entry[1]
+
+    def remember_alias(self, base_key, target):
+        ttl = self.ttl if target else self.miss_ttl
+        with self._lock:
+            self._aliases[base_key] = (time.monotonic() + ttl, target)
+
+    def forget(self, key):
+        """Drop the entry for a storage key, with or without its extension."""
+        base_key, ext = os.path.splitext(key)
+        if ext not in dict(ASSET_EXTENSIONS):
+            base_key = key
+        with self._lock:
+            self._entries.pop(base_key, None)
+            self._aliases.pop(base_key, None)
+
+
+# Initialize singleton
+asset_index = AssetIndex()
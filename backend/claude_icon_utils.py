@@ -1,7 +1,21 @@
-import anthropic
 import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
+import anthropic
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from ai_client import ai
+from asset_index import asset_index
 from cloud_storage_config import storage
+from icon_matching import best_match, normalize_name
+from response_parsing import extract_svg, response_text
+from db import db, IconManifest, IconLock, Ingredient, Allergy
+
+ICON_TYPES = ('ingredient', 'allergy')
 
 
 def build_storage_key(name, category, icon_type='ingredient'):
@@ -11,18 +25,47 @@ def build_storage_key(name, category, icon_type='ingredient'):
 
 
 def generate_icon(name, category, icon_type='ingredient'):
-    """Generate SVG icon using Claude and upload to storage. Synchronous."""
+    """Generate SVG icon using Claude and upload to storage. Synchronous.
+
+    Only one process generates a given key at a time; concurrent callers wait
+    for that generation and reuse its result. Names close enough to an
+    existing icon ("Tomatoes" vs "tomato") reuse it instead.
+    """
     key = build_storage_key(name, category, icon_type)
 
-    if storage.exists(key):
+    if is_icon_stored(key, name, category, icon_type):
+        return True
+
+    match = find_icon_match(name, category, icon_type)
+    if match is not None:
+        link_icon_alias(key, name, category, icon_type, match)
         return True
 
+    token = acquire_icon_lock(key)
+    if token is None:
+        return wait_for_icon(key, name, category, icon_type)
+
+    try:
+        # Another process may have finished it between the check and the lock
+        if is_icon_stored(key, name, category, icon_type):
+            return True
+        # Don't keep a DB connection checked out while waiting on the model
+        db.session.commit()
+        return render_icon(key, name, category, icon_type)
+    finally:
+        release_icon_lock(key, token)
+
+
+RETRYABLE_ERRORS = (anthropic.RateLimitError, anthropic.InternalServerError)
+
+
+def render_icon(key, name, category, icon_type):
     try:
-        client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
         item_type = 'food allergen' if icon_type == 'allergy' else 'food ingredient'
         query = f"{name} {category}".strip() if category else name
 
-        response = client.messages.create(
+        response = ai.create_message(
+            'icons',
             model="claude-haiku-4-5",
             max_tokens=1024,
             messages=[{
@@ -36,33 +79,404 @@ def generate_icon(name, category, icon_type='ingredient'):
             }]
         )
 
-        svg_text = response.content[0].text.strip()
-        if '<svg' in svg_text:
-            start = svg_text.index('<svg')
-            end = svg_text.rindex('</svg>') + 6
-            svg_text = svg_text[start:end]
+        svg_text = extract_svg(response_text(response))
+        if svg_text is None:
+            return False
 
         buffer = BytesIO(svg_text.encode('utf-8'))
-        return storage.upload_image(buffer, key, content_type='image/svg+xml')
+        if not storage.upload_image(buffer, key, content_type='image/svg+xml'):
+            return False
 
+        set_icon_stored(key, name, category, icon_type, True)
+        return True
+
+    except RETRYABLE_ERRORS:
+        # Let callers back off and retry (icon job retries, warm-icons backoff)
+        raise
     except Exception:
         return False
 
 
+# Single-flight locks
+# A row in icon_locks marks a key as being generated. Inserting the row takes
+# the lock; expired rows (from a crashed process) can be taken over.
+
+ICON_LOCK_TTL_SECONDS = float(os.getenv('ICON_LOCK_TTL_SECONDS', '120'))
+ICON_LOCK_WAIT_SECONDS = float(os.getenv('ICON_LOCK_WAIT_SECONDS', '60'))
+ICON_LOCK_POLL_SECONDS = 0.5
+
+
+def acquire_icon_lock(key):
+    """Take the generation lock for a key; returns an owner token, or None if it is held."""
+    token = uuid.uuid4().hex
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=ICON_LOCK_TTL_SECONDS)
+
+    try:
+        db.session.add(IconLock(key=key, owner=token, expires_at=expires_at))
+        db.session.commit()
+        return token
+    except IntegrityError:
+        db.session.rollback()
+
+    taken = db.session.execute(
+        update(IconLock)
+        .where(IconLock.key == key, IconLock.expires_at < now)
+        .values(owner=token, expires_at=expires_at)
+    )
+    db.session.commit()
+    return token if taken.rowcount == 1 else None
+
+
+def release_icon_lock(key, token):
+    db.session.rollback()
+    db.session.execute(delete(IconLock).where(IconLock.key == key, IconLock.owner == token))
+    db.session.commit()
+
+
+def wait_for_icon(key, name, category, icon_type):
+    """Wait for another process's generation of key to finish and report whether it stored the icon."""
+    deadline = time.monotonic() + ICON_LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(ICON_LOCK_POLL_SECONDS)
+        db.session.commit()  # end the transaction so the next reads see other processes' commits
+        if db.session.get(IconLock, key) is None:
+            break
+
+    db.session.commit()
+    return is_icon_stored(key, name, category, icon_type)
+
+
+# Fuzzy matching
+# Every manifest row carries a normalized name (case, punctuation and plurals
+# folded). Before generating, a new name is compared with the stored icons of
+# the same type; a close enough match is recorded as an alias row that the
+# asset route resolves, so no model call or new file is needed.
+
+ICON_MATCH_ENABLED = os.getenv('ICON_MATCH_ENABLED', 'true').lower() == 'true'
+ICON_MATCH_THRESHOLD = float(os.getenv('ICON_MATCH_THRESHOLD', '0.6'))
+ICON_MATCH_MULTIWORD_THRESHOLD = float(os.getenv('ICON_MATCH_MULTIWORD_THRESHOLD', '0.75'))
+
+
+def find_icon_match(name, category, icon_type):
+    """Return the key of a stored icon whose name matches closely enough, or None."""
+    normalized = normalize_name(name)
+    if not ICON_MATCH_ENABLED or not normalized:
+        return None
+
+    category = (category or '').lower()
+    query = select(IconManifest.key, IconManifest.normalized).where(
+        IconManifest.icon_type == icon_type,
+        IconManifest.stored.is_(True),
+        IconManifest.alias_of.is_(None),
+        IconManifest.normalized.is_not(None),
+    )
+    if category:
+        # An uncategorized icon may be a different food with the same name
+        query = query.where(IconManifest.category == category)
+
+    exact = db.session.execute(query.where(IconManifest.normalized == normalized).limit(1)).first()
+    if exact is not None:
+        return exact.key
+    return best_match(normalized, db.session.execute(query).all(), ICON_MATCH_THRESHOLD, ICON_MATCH_MULTIWORD_THRESHOLD)
+
+
+def link_icon_alias(key, name, category, icon_type, target):
+    """Point key at the stored icon target instead of generating one."""
+    stmt = _manifest_insert().values(
+        key=key,
+        icon_type=icon_type,
+        name=name,
+        category=category or '',
+        ref_count=0,
+        stored=True,
+        normalized=normalize_name(name),
+        alias_of=target,
+        updated_at=datetime.now(timezone.utc),
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=['key'], set_={'stored': True, 'alias_of': target})
+    db.session.execute(stmt)
+    db.session.commit()
+    asset_index.forget(key)
+
+
+def resolve_icon_alias(base_key):
+    """Base key (no extension) of the icon an aliased key points at, or None."""
+    found, target = asset_index.lookup_alias(base_key)
+    if not found:
+        target = db.session.scalar(select(IconManifest.alias_of).where(IconManifest.key == f"{base_key}.svg"))
+        if target is not None:
+            target = os.path.splitext(target)[0]
+        asset_index.remember_alias(base_key, target)
+    return target
+
+
+def missing_icon_pairs(pairs, icon_type='ingredient'):
+    """Collapse (name, category) pairs to the unique ones that have no stored icon yet."""
+    unique = list(dict.fromkeys((name, category or '') for name, category in pairs))
+    keys = {build_storage_key(name, category, icon_type) for name, category in unique}
+    stored = set(db.session.scalars(
+        select(IconManifest.key).where(IconManifest.key.in_(keys), IconManifest.stored.is_(True))
+    )) if keys else set()
+    return [
+        (name, category) for name, category in unique
+        if build_storage_key(name, category, icon_type) not in stored
+    ]
+
 
-def cleanup_icon_if_unused(name, category, icon_type, model_class, check_column='name'):
-    """Delete SVG icon from storage if no longer used by any user."""
-    if not category:
-        category = ''
+# Icon manifest
+# icon_manifest has one row per generated icon key with the number of
+# ingredient/allergy rows that use it. Routes adjust the counts inside the
+# same transaction as the rows they change, so "does this icon exist" and
+# "is it still used" are single primary-key lookups.
 
-    filter_kwargs = {check_column: name}
-    if icon_type == 'ingredient':
-        filter_kwargs['category'] = category
+def _manifest_insert():
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(IconManifest.__table__)
+
+
+def _manifest_entries(pairs, icon_type):
+    # pairs is a list of (name, category) or a Counter of (name, category) -> count
+    if isinstance(pairs, Counter):
+        counts = pairs
     else:
-        filter_kwargs['allergy_category'] = category
+        counts = Counter((name.lower(), (category or '').lower()) for name, category in pairs)
+    return [
+        {
+            'key': build_storage_key(name, category, icon_type),
+            'icon_type': icon_type,
+            'name': name,
+            'category': category,
+            'ref_count': count,
+            'normalized': normalize_name(name),
+            'updated_at': datetime.now(timezone.utc),
+        }
+        for (name, category), count in counts.items()
+    ]
+
+
+def add_icon_refs(pairs, icon_type='ingredient'):
+    """Count new references to the icons of (name, category) pairs. Does not commit."""
+    entries = _manifest_entries(pairs, icon_type)
+    if not entries:
+        return
+
+    stmt = _manifest_insert()
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['key'],
+        set_={
+            'ref_count': IconManifest.__table__.c.ref_count + stmt.excluded.ref_count,
+            'updated_at': stmt.excluded.updated_at,
+        },
+    )
+    db.session.execute(stmt, entries)
+
+
+def pin_icons(pairs, icon_type='ingredient'):
+    """Mark the icons of (name, category) pairs as catalog icons. Does not commit."""
+    entries = _manifest_entries(pairs, icon_type)
+    if not entries:
+        return
+
+    for entry in entries:
+        entry.update(ref_count=0, pinned=True)
+    stmt = _manifest_insert()
+    stmt = stmt.on_conflict_do_update(index_elements=['key'], set_={'pinned': True})
+    db.session.execute(stmt, entries)
+
+
+def release_icon_refs(pairs, icon_type='ingredient'):
+    """Drop references to the icons of (name, category) pairs. Does not commit.
+
+    Manifest rows that reach zero are removed; their keys are returned so the
+    caller can delete the stored icons once its transaction has committed.
+    Icons that aliases still point at are kept, and released along with
+    their last alias. Pinned catalog icons are never released.
+    """
+    entries = _manifest_entries(pairs, icon_type)
+    if not entries:
+        return []
+
+    table = IconManifest.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.key == bindparam('b_key'))
+        .values(ref_count=table.c.ref_count - bindparam('b_count')),
+        [{'b_key': entry['key'], 'b_count': entry['ref_count']} for entry in entries],
+    )
+
+    aliases = table.alias('aliases')
+    unaliased = ~select(aliases.c.key).where(aliases.c.alias_of == table.c.key).exists()
+
+    def delete_orphans(keys):
+        return db.session.execute(
+            delete(table)
+            .where(table.c.key.in_(keys), table.c.ref_count <= 0, table.c.pinned.is_not(True), unaliased)
+            .returning(table.c.key, table.c.stored, table.c.alias_of)
+        ).all()
+
+    orphaned = delete_orphans([entry['key'] for entry in entries])
+    targets = {alias_of for _, _, alias_of in orphaned if alias_of}
+    if targets:
+        orphaned += delete_orphans(targets)
+    # Alias rows have no file of their own
+    return [key for key, stored, alias_of in orphaned if stored is not False and alias_of is None]
+
+
+def delete_icons(keys):
+    """Delete icons released by release_icon_refs. Call after committing."""
+    if keys:
+        storage.delete_many(keys)
+
+
+def is_icon_stored(key, name, category, icon_type):
+    """Check the manifest for an icon, falling back to storage the first time a key is seen."""
+    row = db.session.get(IconManifest, key)
+    if row is not None and row.stored is not None:
+        return row.stored
+
+    exists = storage.exists(key)
+    set_icon_stored(key, name, category, icon_type, exists)
+    return exists
+
+
+def set_icon_stored(key, name, category, icon_type, stored):
+    stmt = _manifest_insert().values(
+        key=key,
+        icon_type=icon_type,
+        name=name,
+        category=category or '',
+        ref_count=0,
+        stored=stored,
+        normalized=normalize_name(name),
+        updated_at=datetime.now(timezone.utc),
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=['key'], set_={'stored': stored, 'alias_of': None})
+    db.session.execute(stmt)
+    db.session.commit()
+
+
+ICON_COLUMNS = {
+    'ingredient': (Ingredient, Ingredient.name, Ingredient.category),
+    'allergy': (Allergy, Allergy.allergy_name, Allergy.allergy_category),
+}
+
+
+def grouped_icon_pairs(icon_type, user_id=None):
+    """Count rows per lowercased (name, category) pair with one GROUP BY query."""
+    model, name_column, category_column = ICON_COLUMNS[icon_type]
+    name = func.lower(name_column)
+    category = func.lower(func.coalesce(category_column, ''))
+    query = select(name, category, func.count()).group_by(name, category)
+    if user_id is not None:
+        query = query.where(model.user_id == user_id)
+    return Counter({(item_name, item_category): count for item_name, item_category, count in db.session.execute(query)})
+
+
+def count_icon_refs():
+    """Return {key: manifest row} built from grouped counts of the ingredient and allergy tables."""
+    rows = {}
+    for icon_type in ICON_TYPES:
+        for (item_name, item_category), count in grouped_icon_pairs(icon_type).items():
+            key = build_storage_key(item_name, item_category, icon_type)
+            rows[key] = {
+                'key': key,
+                'icon_type': icon_type,
+                'name': item_name,
+                'category': item_category,
+                'ref_count': count,
+                'stored': None,
+                'normalized': normalize_name(item_name),
+                'alias_of': None,
+                'updated_at': datetime.now(timezone.utc),
+            }
+    return rows
+
+
+def rebuild_icon_manifest(stored_keys=None):
+    """Replace the manifest with fresh reference counts.
+
+    With stored_keys (a bucket listing) every row's `stored` flag is set and
+    stored icons nobody references are kept with a zero count; without it
+    `stored` is left unknown and checked lazily by generate_icon. With
+    stored_keys, aliases of referenced keys are kept while their target is stored.
+    Pinned catalog icons keep their rows either way.
+    """
+    rows = count_icon_refs()
+    aliases = dict(db.session.execute(
+        select(IconManifest.key, IconManifest.alias_of).where(IconManifest.alias_of.is_not(None))
+    ).all())
+    pinned = db.session.execute(
+        select(
+            IconManifest.key, IconManifest.icon_type, IconManifest.name,
+            IconManifest.category, IconManifest.stored,
+        ).where(IconManifest.pinned.is_(True))
+    ).all()
+
+    if stored_keys is not None:
+        for row in rows.values():
+            row['stored'] = row['key'] in stored_keys
+        for key in stored_keys - rows.keys():
+            asset_type, _, filename = key.split('/', 2)
+            name = filename.rsplit('/', 1)[-1][:-len('.svg')]
+            rows[key] = {
+                'key': key,
+                'icon_type': 'allergy' if asset_type == 'allergies' else 'ingredient',
+                'name': name,
+                'category': '',
+                'ref_count': 0,
+                'stored': True,
+                'normalized': normalize_name(name),
+                'alias_of': None,
+                'updated_at': datetime.now(timezone.utc),
+            }
+
+    for key, target in aliases.items():
+        row, target_row = rows.get(key), rows.get(target)
+        if row is not None and not row['stored'] and target_row is not None and target_row['stored']:
+            row['stored'] = True
+            row['alias_of'] = target
+
+    for row in rows.values():
+        row['pinned'] = None
+    for key, icon_type, name, category, stored in pinned:
+        if key not in rows:
+            rows[key] = {
+                'key': key,
+                'icon_type': icon_type,
+                'name': name,
+                'category': category,
+                'ref_count': 0,
+                'stored': stored if stored_keys is None else key in stored_keys,
+                'normalized': normalize_name(name),
+                'alias_of': None,
+                'updated_at': datetime.now(timezone.utc),
+            }
+        rows[key]['pinned'] = True
+
+    db.session.execute(delete(IconManifest))
+    if rows:
+        db.session.execute(IconManifest.__table__.insert(), list(rows.values()))
+    db.session.commit()
+    return rows
+
+
+def ensure_icon_manifest():
+    """Build the manifest from the database on first start of a deployment that has none."""
+    if db.session.query(IconManifest.key).first() is not None:
+        return
+    if db.session.query(Ingredient.id).first() is None and db.session.query(Allergy.id).first() is None:
+        return
+    try:
+        rebuild_icon_manifest()
+    except IntegrityError:
+        # Another worker process built it at the same time
+        db.session.rollback()
 
-    count = model_class.query.filter_by(**filter_kwargs).count()
 
-    if count == 0:
-        key = build_storage_key(name, category, icon_type)
-        storage.delete(key)
+def list_stored_icon_keys():
+    keys = set()
+    for icon_type in ICON_TYPES:
+        prefix = build_storage_key('', '', icon_type).rsplit('/', 1)[0] + '/'
+        keys.update(key for key in storage.list_keys(prefix) if key.endswith('.svg'))
+    return keys
@@ -0,0 +1,145 @@
+# clients.py
+import os
+import threading
+from contextlib import contextmanager
+
+import anthropic
+import boto3
+import httpx
+import requests
+from botocore.config import Config
+from requests.adapters import HTTPAdapter
+
+
+class PoolGauge:
+    """Tracks how many connections of a pool are in use and how often it ran full."""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak = 0
+        self.requests = 0
+        self.saturated = 0
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.in_use += 1
+            self.requests += 1
+            self.peak = max(self.peak, self.in_use)
+            if self.in_use > self.size:
+                self.saturated += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_use -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'peak': self.peak,
+                'requests': self.requests,
+                'saturated': self.saturated,
+            }
+
+
+class ClientRegistry:
+    """Long-lived, keep-alive clients shared by every request in a worker process.
+
+    Clients are built lazily and rebuilt after a fork, so each gunicorn worker
+    gets its own connection pools.
+    """
+
+    def __init__(self):
+        self.anthropic_pool_size = int(os.getenv('ANTHROPIC_POOL_SIZE', '100'))
+        self.anthropic_timeout = float(os.getenv('ANTHROPIC_TIMEOUT_SECONDS', '100'))
+        self.http_pool_size = int(os.getenv('HTTP_POOL_SIZE', '20'))
+        self.http_timeout = float(os.getenv('HTTP_TIMEOUT_SECONDS', '10'))
+        self.s3_pool_size = int(os.getenv('S3_POOL_SIZE', '20'))
+        self.s3_timeout = float(os.getenv('S3_TIMEOUT_SECONDS', '10'))
+
+        self.gauges = {
+            'anthropic': PoolGauge(self.anthropic_pool_size),
+            'http': PoolGauge(self.http_pool_size),
+            's3': PoolGauge(self.s3_pool_size),
+        }
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._clients = {}
+
+    def anthropic(self):
+        """Thread-safe Anthropic client shared by request threads and icon workers."""
+        return self._get('anthropic', lambda: anthropic.Anthropic(
+            api_key=os.getenv('ANTHROPIC_API_KEY'),
+            timeout=self.anthropic_timeout,
+            http_client=anthropic.DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=self.anthropic_pool_size,
+                    max_keepalive_connections=self.anthropic_pool_size,
+                ),
+                timeout=self.anthropic_timeout,
+            ),
+        ))
+
+    def http(self):
+        return self._get('http', self._build_http_session)
+
+    def http_get(self, url, **kwargs):
+        """GET through the pooled session with the configured default timeout."""
+        kwargs.setdefault('timeout', self.http_timeout)
+        with self.gauges['http'].track():
+            return self.http().get(url, **kwargs)
+
+    def http_head(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.http_timeout)
+        with self.gauges['http'].track():
+            return self.http().head(url, **kwargs)
+
+    def s3(self):
+        return self._get('s3', lambda: boto3.client(
+            's3',
+            aws_access_key_id=os.getenv('R2_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('R2_SECRET_ACCESS_KEY'),
+            region_name=os.getenv('R2_REGION', 'auto'),
+            endpoint_url=os.getenv('R2_ENDPOINT_URL') or None,
+            config=Config(
+                max_pool_connections=self.s3_pool_size,
+                connect_timeout=self.s3_timeout,
+                read_timeout=self.s3_timeout,
+                retries={'max_attempts': 3, 'mode': 'standard'},
+            ),
+        ))
+
+    def stats(self):
+        return {name: gauge.snapshot() for name, gauge in self.gauges.items()}
+
+    def _build_http_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.http_pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _get(self, name, factory):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._clients = {}
+                    self._pid = os.getpid()
+
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = factory()
+        return client
+
+
+# Initialize singleton
+clients = ClientRegistry()
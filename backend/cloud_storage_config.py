@@ -1,90 +1,135 @@
 # cloud_storage_config.py
+import logging
 import os
-import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
+from clients import clients
+from local_storage import LocalStorage
+from storage_backend import MemoryStorage, StorageBackend
 
 load_dotenv()
 
-class CloudStorage:
+logger = logging.getLogger(__name__)
+
+LOCAL_ASSETS_PATH = './ingredient_icon_generator/assets'
+
+
+class S3Storage(StorageBackend):
+    """Cloudflare R2 (or any S3-compatible bucket) through the pooled S3 client."""
+
+    use_cloud = True
+
     def __init__(self):
-        self.use_cloud = os.getenv('USE_CLOUD_STORAGE', 'false').lower() == 'true'
-
-        if self.use_cloud:
-            self.client = boto3.client(
-                's3',
-                aws_access_key_id=os.getenv('R2_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('R2_SECRET_ACCESS_KEY'),
-                region_name=os.getenv('R2_REGION', 'auto'),
-                endpoint_url=os.getenv('R2_ENDPOINT_URL') or None
-            )
-            self.bucket_name = os.getenv('R2_BUCKET_NAME')
-            self.cdn_url = os.getenv('CDN_URL', '')
-        else:
-            # Local storage fallback for development
-            self.local_base_path = './ingredient_icon_generator/assets'
-    
-    def upload_image(self, file_obj, key, content_type='image/png'):
-        """Upload image to cloud storage or save locally"""
-        if self.use_cloud:
-            try:
+        self.bucket_name = os.getenv('R2_BUCKET_NAME')
+        self.cdn_url = os.getenv('CDN_URL', '')
+        # Objects above the threshold are sent as a multipart upload, parts in parallel
+        self.transfer_config = TransferConfig(
+            multipart_threshold=int(os.getenv('STORAGE_MULTIPART_THRESHOLD_BYTES', str(8 * 1024 * 1024))),
+            multipart_chunksize=int(os.getenv('STORAGE_MULTIPART_CHUNK_BYTES', str(8 * 1024 * 1024))),
+            max_concurrency=int(os.getenv('STORAGE_MULTIPART_CONCURRENCY', '4')),
+        )
+
+    @property
+    def client(self):
+        """Pooled S3/R2 client shared through the client registry."""
+        return clients.s3()
+
+    def _upload(self, file_obj, key, content_type, cache_control=None):
+        try:
+            with clients.gauges['s3'].track():
                 self.client.upload_fileobj(
                     file_obj,
                     self.bucket_name,
                     key,
                     ExtraArgs={
                         'ContentType': content_type,
-                        'CacheControl': 'max-age=31536000',  # 1 year cache
-                    }
+                        'CacheControl': cache_control or 'max-age=31536000',  # 1 year cache
+                    },
+                    Config=self.transfer_config,
                 )
-                return True
-            except ClientError:
-                return False
-        else:
-            # Local storage
-            local_path = os.path.join(self.local_base_path, key)
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-            file_obj.seek(0)
-            with open(local_path, 'wb') as f:
-                f.write(file_obj.read())
             return True
-    
+        except ClientError:
+            return False
+
     def exists(self, key):
         """Check if file exists in storage"""
-        if self.use_cloud:
-            try:
+        try:
+            with clients.gauges['s3'].track():
                 self.client.head_object(Bucket=self.bucket_name, Key=key)
-                return True
-            except ClientError:
-                return False
-        else:
-            return os.path.exists(os.path.join(self.local_base_path, key))
-    
-    def delete(self, key):
-        """Delete file from storage"""
-        if self.use_cloud:
-            try:
+            return True
+        except ClientError:
+            return False
+
+    def _delete(self, key):
+        try:
+            with clients.gauges['s3'].track():
                 self.client.delete_object(Bucket=self.bucket_name, Key=key)
-                return True
-            except ClientError:
-                return False
-        else:
-            local_path = os.path.join(self.local_base_path, key)
-            if os.path.exists(local_path):
-                os.remove(local_path)
-                return True
+            return True
+        except ClientError:
             return False
-    
+
+    def _delete_many(self, keys):
+        failed = []
+        # Up to 1000 keys per S3 DeleteObjects call
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            try:
+                with clients.gauges['s3'].track():
+                    response = self.client.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True},
+                    )
+            except ClientError as e:
+                logger.warning("delete_objects failed for %d keys: %s", len(batch), e)
+                failed.extend(batch)
+                continue
+            # A quiet DeleteObjects still succeeds overall when single keys fail
+            for error in response.get('Errors', []):
+                logger.warning("could not delete %s: %s %s", error.get('Key'), error.get('Code'), error.get('Message'))
+                failed.append(error.get('Key'))
+        return failed
+
+    def read(self, key):
+        """(bytes, content_type) stored under key, or None."""
+        try:
+            with clients.gauges['s3'].track():
+                obj = self.client.get_object(Bucket=self.bucket_name, Key=key)
+                return obj['Body'].read(), obj.get('ContentType', 'application/octet-stream')
+        except ClientError:
+            return None
+
+    def list_keys(self, prefix=''):
+        """Yield every stored key under a prefix"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key']
+
     def get_url(self, key):
         """Get public URL for the file"""
-        if self.use_cloud:
-            if self.cdn_url:
-                return f"{self.cdn_url}/{key}"
-            else:
-                raise ValueError("CDN_URL must be set when using Cloudflare R2")
-        else:
-            # Return local API endpoint
-            return f"/api/assets/{key}"
+        if self.cdn_url:
+            return f"{self.cdn_url}/{key}"
+        raise ValueError("CDN_URL must be set when using Cloudflare R2")
+
+
+def create_storage(backend=None):
+    """Storage backend named by STORAGE_BACKEND: 's3', 'local' or 'memory'.
+
+    Without it, USE_CLOUD_STORAGE=true picks 's3' and anything else 'local'.
+    """
+    if backend is None:
+        default = 's3' if os.getenv('USE_CLOUD_STORAGE', 'false').lower() == 'true' else 'local'
+        backend = os.getenv('STORAGE_BACKEND', default).lower()
+    if backend == 's3':
+        return S3Storage()
+    if backend == 'local':
+        # Local storage fallback for development
+        return LocalStorage(LOCAL_ASSETS_PATH)
+    if backend == 'memory':
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
 
 # Initialize singleton
-storage = CloudStorage()
\ No newline at end of file
+storage = create_storage()
@@ -1,9 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DatabaseError
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timezone
 
 db = SQLAlchemy()
 
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
 # Define models
 class User(db.Model):
     __tablename__ = 'users'
@@ -24,12 +30,12 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-    def to_dict(self):
+    def to_dict(self, ingredients_count=None):
         return {
             'id': self.id,
             'username': self.username,
             'email': self.email,
-            'ingredients_count': len(self.ingredients)
+            'ingredients_count': len(self.ingredients) if ingredients_count is None else ingredients_count
         }
 
 
@@ -42,6 +48,8 @@ class Ingredient(db.Model):
     unit = db.Column(db.String(20))
     category = db.Column(db.String(50))
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    # Nullable so the column can be added to existing tables (see add_missing_columns)
+    updated_at = db.Column(db.DateTime, nullable=True, default=utcnow, onupdate=utcnow)
 
     def to_dict(self):
         return {
@@ -50,7 +58,8 @@ class Ingredient(db.Model):
             'quantity': self.quantity,
             'unit': self.unit,
             'category': self.category or '',
-            'user_id': self.user_id
+            'user_id': self.user_id,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
 
 
@@ -61,13 +70,15 @@ class Allergy(db.Model):
     allergy_name = db.Column(db.String(100), nullable=False)
     allergy_category = db.Column(db.String(50), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=utcnow, onupdate=utcnow)
 
     def to_dict(self):
         return {
             'id': self.id,
             'allergy_name': self.allergy_name,
             'allergy_category': self.allergy_category or '',
-            "user_id": self.user_id
+            "user_id": self.user_id,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
 
 
@@ -79,6 +90,10 @@ class Recipe(db.Model):
     recipe = db.Column(db.String(50000), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=utcnow, onupdate=utcnow)
+
+    # Backs the saved-recipes pages (newest first per user)
+    __table_args__ = (db.Index('ix_recipes_user_id_created_at', 'user_id', 'created_at'),)
 
     def to_dict(self):
         return {
@@ -86,5 +101,126 @@ class Recipe(db.Model):
             'name': self.name,
             'recipe': self.recipe,
             'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             "user_id": self.user_id
         }
+
+
+class UserVersion(db.Model):
+    __tablename__ = 'user_versions'
+
+    # Bumped in the same transaction as every write to a user's data
+    user_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IconJob(db.Model):
+    __tablename__ = 'icon_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=False, default='')
+    icon_type = db.Column(db.String(20), nullable=False)
+    storage_key = db.Column(db.String(255), nullable=False, index=True)
+    # User who queued the job; only they can read it. Nullable for tables created before it existed
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500))
+    run_after = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category or '',
+            'icon_type': self.icon_type,
+            'key': self.storage_key,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class RecipeCacheEntry(db.Model):
+    __tablename__ = 'recipe_cache'
+
+    key = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    recipes = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class ScanCacheEntry(db.Model):
+    __tablename__ = 'scan_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    scan_type = db.Column(db.String(20), nullable=False)
+    image_hash = db.Column(db.String(16), nullable=False)  # 64-bit dHash, hex
+    items = db.Column(db.Text, nullable=False)  # JSON list
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (db.Index('ix_scan_cache_user_scan_type', 'user_id', 'scan_type'),)
+
+
+class IconManifest(db.Model):
+    __tablename__ = 'icon_manifest'
+
+    key = db.Column(db.String(255), primary_key=True)
+    icon_type = db.Column(db.String(20), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=False, default='')
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    # None means "not checked yet" (e.g. rows rebuilt from the database alone)
+    stored = db.Column(db.Boolean, nullable=True)
+    # Folded name used for fuzzy matching (see icon_matching.normalize_name)
+    normalized = db.Column(db.String(100), nullable=True, index=True)
+    # Key of the existing icon this key reuses instead of having its own file
+    alias_of = db.Column(db.String(255), nullable=True, index=True)
+    # Catalog icons (flask warm-icons) are kept even when no row references them
+    pinned = db.Column(db.Boolean, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class IconLock(db.Model):
+    __tablename__ = 'icon_locks'
+
+    key = db.Column(db.String(255), primary_key=True)
+    owner = db.Column(db.String(32), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+def add_missing_columns():
+    """Add nullable model columns and indexes that existing tables lack.
+
+    db.create_all() only creates missing tables, so columns and indexes
+    added to a model later are added here.
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        added = [column for column in table.columns if column.name not in existing and column.nullable]
+        for column in added:
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            except DatabaseError:
+                # Another worker process added it first
+                pass
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                try:
+                    index.create(db.engine, checkfirst=True)
+                except DatabaseError:
+                    pass
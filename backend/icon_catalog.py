@@ -0,0 +1,99 @@
+# icon_catalog.py
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from claude_icon_utils import ICON_TYPES, RETRYABLE_ERRORS, generate_icon, missing_icon_pairs, pin_icons
+from db import db
+
+DEFAULT_SEEDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icon_seeds.json')
+
+
+def load_seeds(path=DEFAULT_SEEDS_PATH):
+    """Read {"ingredient": [[name, category], ...], "allergy": [...]} from a JSON file."""
+    with open(path) as f:
+        raw = json.load(f)
+    return {
+        icon_type: [(name.strip().lower(), (category or '').strip().lower()) for name, category in raw.get(icon_type, [])]
+        for icon_type in ICON_TYPES
+    }
+
+
+class RateLimitGate:
+    """Shared pause so every warm-up thread backs off when any of them is rate limited."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def retry_delay(error, attempt, base_delay):
+    """Honour the API's retry-after header, else back off exponentially with jitter."""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return base_delay * 2 ** attempt + random.uniform(0, base_delay)
+
+
+def warm_icon_catalog(app, seeds, concurrency=4, max_attempts=5, base_delay=2.0, log=print):
+    """Generate every seed icon that isn't stored yet.
+
+    Already-stored icons are skipped using the icon manifest, so an
+    interrupted run can simply be started again. Every seed is pinned so
+    the icon stays stored when the last user row that uses it goes away.
+    """
+    with app.app_context():
+        for icon_type in ICON_TYPES:
+            pin_icons(seeds.get(icon_type, []), icon_type)
+        db.session.commit()
+        todo = [
+            (name, category, icon_type)
+            for icon_type in ICON_TYPES
+            for name, category in missing_icon_pairs(seeds.get(icon_type, []), icon_type)
+        ]
+
+    total_seeds = sum(len(pairs) for pairs in seeds.values())
+    log(f"{total_seeds - len(todo)} of {total_seeds} seed icons already stored, generating {len(todo)}")
+
+    gate = RateLimitGate()
+    results = {'generated': 0, 'failed': 0}
+    results_lock = threading.Lock()
+
+    def warm(name, category, icon_type):
+        label = f"{icon_type} '{name} / {category}'" if category else f"{icon_type} '{name}'"
+        ok = False
+        for attempt in range(max_attempts):
+            gate.wait()
+            try:
+                with app.app_context():
+                    ok = generate_icon(name, category, icon_type)
+                break
+            except RETRYABLE_ERRORS as e:
+                delay = retry_delay(e, attempt, base_delay)
+                log(f"  rate limited on {label}, backing off {delay:.1f}s")
+                gate.pause(delay)
+
+        with results_lock:
+            results['generated' if ok else 'failed'] += 1
+            done = results['generated'] + results['failed']
+        log(f"  [{done}/{len(todo)}] {label}: {'ok' if ok else 'FAILED'}")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='warm-icons') as pool:
+        for name, category, icon_type in todo:
+            pool.submit(warm, name, category, icon_type)
+
+    return results
@@ -0,0 +1,216 @@
+# icon_jobs.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, update
+
+from db import db, IconJob
+from claude_icon_utils import build_storage_key, generate_icon
+
+ACTIVE_STATUSES = ('pending', 'running')
+FINISHED_STATUSES = ('done', 'failed')
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+class IconWorker:
+    """Runs queued icon jobs from the icon_jobs table on a bounded thread pool.
+
+    Every web process runs its own worker; jobs are claimed with a conditional
+    UPDATE so several processes can share the table without a broker.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('ICON_WORKER_ENABLED', 'true').lower() == 'true'
+        self.concurrency = max(1, int(os.getenv('ICON_WORKER_CONCURRENCY', '2')))
+        self.max_attempts = max(1, int(os.getenv('ICON_JOB_MAX_ATTEMPTS', '3')))
+        self.poll_interval = float(os.getenv('ICON_WORKER_POLL_SECONDS', '2'))
+        self.retry_delay = float(os.getenv('ICON_JOB_RETRY_SECONDS', '10'))
+        self.stale_after = float(os.getenv('ICON_JOB_STALE_SECONDS', '300'))
+        self.retention = float(os.getenv('ICON_JOB_RETENTION_SECONDS', '86400'))
+        self.prune_interval = 600
+
+        self.app = None
+        self._pid = None
+        self._last_requeue = 0.0
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._slots = threading.Semaphore(self.concurrency)
+        self._executor = None
+
+    def init_app(self, app):
+        self.app = app
+        if self.enabled:
+            app.before_request(self.ensure_started)
+
+    def ensure_started(self):
+        """Start the dispatcher thread once per process (safe after gunicorn forks)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._wakeup = threading.Event()
+            self._slots = threading.Semaphore(self.concurrency)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix='icon-worker'
+            )
+            threading.Thread(target=self._dispatch_loop, name='icon-dispatcher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def run_forever(self):
+        """Run the dispatcher in the foreground (used by `flask icon-worker`)."""
+        self.ensure_started()
+        while True:
+            time.sleep(3600)
+
+    def _dispatch_loop(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self._requeue_stale()
+                    self._prune_finished()
+                    self._dispatch_pending()
+            except Exception:
+                # Keep the dispatcher alive through transient DB errors
+                pass
+
+    def _requeue_stale(self):
+        if time.monotonic() - self._last_requeue < self.stale_after / 2:
+            return
+        self._last_requeue = time.monotonic()
+
+        cutoff = _utcnow() - timedelta(seconds=self.stale_after)
+        db.session.execute(
+            update(IconJob)
+            .where(IconJob.status == 'running', IconJob.updated_at < cutoff)
+            .values(status='pending', updated_at=_utcnow())
+        )
+        db.session.commit()
+
+    def _prune_finished(self):
+        """Delete done and failed jobs older than the retention period."""
+        if time.monotonic() - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = time.monotonic()
+
+        cutoff = _utcnow() - timedelta(seconds=self.retention)
+        db.session.execute(
+            delete(IconJob)
+            .where(IconJob.status.in_(FINISHED_STATUSES), IconJob.updated_at < cutoff)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def _dispatch_pending(self):
+        while self._slots.acquire(blocking=False):
+            job_id = self._claim_next()
+            if job_id is None:
+                self._slots.release()
+                return
+            self._executor.submit(self._run_job, job_id)
+
+    def _claim_next(self):
+        now = _utcnow()
+        candidates = (
+            db.session.query(IconJob.id)
+            .filter(IconJob.status == 'pending', IconJob.run_after <= now)
+            .order_by(IconJob.id)
+            .limit(self.concurrency * 2)
+            .all()
+        )
+        for (job_id,) in candidates:
+            claimed = db.session.execute(
+                update(IconJob)
+                .where(IconJob.id == job_id, IconJob.status == 'pending')
+                .values(status='running', attempts=IconJob.attempts + 1, updated_at=now)
+            )
+            db.session.commit()
+            if claimed.rowcount == 1:
+                return job_id
+        return None
+
+    def _run_job(self, job_id):
+        try:
+            with self.app.app_context():
+                job = db.session.get(IconJob, job_id)
+                if job is None:
+                    return
+                name, category, icon_type = job.name, job.category, job.icon_type
+                # Don't hold a pooled DB connection for the length of the model call
+                db.session.close()
+
+                try:
+                    ok = generate_icon(name, category, icon_type)
+                    error = None if ok else 'Icon generation failed'
+                except Exception as e:
+                    ok, error = False, str(e)[:500]
+
+                job = db.session.get(IconJob, job_id)
+                job.updated_at = _utcnow()
+                if ok:
+                    job.status = 'done'
+                    job.last_error = None
+                elif job.attempts < self.max_attempts:
+                    job.status = 'pending'
+                    job.last_error = error
+                    job.run_after = _utcnow() + timedelta(seconds=self.retry_delay * 2 ** (job.attempts - 1))
+                else:
+                    job.status = 'failed'
+                    job.last_error = error
+                db.session.commit()
+        finally:
+            self._slots.release()
+            self.wake()
+
+
+def enqueue_icon(name, category, icon_type='ingredient', user_id=None):
+    """Queue an icon for background generation, reusing the user's job already in flight."""
+    return enqueue_icons([(name, category)], icon_type, user_id)[0]
+
+
+def enqueue_icons(pairs, icon_type='ingredient', user_id=None, commit=True):
+    """Queue icons for a list of (name, category) pairs with a single lookup and insert.
+
+    Returns one job per pair, in order; duplicate pairs share a job. Jobs
+    belong to user_id, so only that user's in-flight jobs are reused (the
+    icon itself is still generated once, see generate_icon). With
+    commit=False the new jobs are only added to the session so the caller can
+    commit them together with its own rows.
+    """
+    keyed = [(build_storage_key(name, category or '', icon_type), name, category or '') for name, category in pairs]
+    keys = {key for key, _, _ in keyed}
+
+    jobs = {}
+    if keys:
+        active = IconJob.query.filter(
+            IconJob.storage_key.in_(keys),
+            IconJob.status.in_(ACTIVE_STATUSES),
+            IconJob.user_id == user_id,
+        ).all()
+        jobs = {job.storage_key: job for job in active}
+
+    for key, name, category in keyed:
+        if key not in jobs:
+            jobs[key] = IconJob(name=name, category=category, icon_type=icon_type, storage_key=key, user_id=user_id)
+            db.session.add(jobs[key])
+
+    if commit:
+        db.session.commit()
+        icon_worker.wake()
+    return [jobs[key] for key, _, _ in keyed]
+
+
+# Initialize singleton
+icon_worker = IconWorker()
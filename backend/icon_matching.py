@@ -0,0 +1,75 @@
+# icon_matching.py
+import re
+import unicodedata
+
+# Words whose trailing "s" is not a plural
+_NOT_PLURAL = {'asparagus', 'couscous', 'hummus', 'molasses', 'swiss', 'grits', 'oats', 'brussels', 'citrus'}
+_ES_ENDINGS = ('ches', 'shes', 'sses', 'xes', 'zes', 'oes')
+# The few food words whose "-ves" plural comes from "-f"; olives, chives, cloves just drop the "s"
+_VES_TO_F = {'leaves': 'leaf', 'loaves': 'loaf', 'halves': 'half', 'calves': 'calf', 'knives': 'knife', 'shelves': 'shelf'}
+
+
+def singularize(word):
+    """Cheap English singular form, good enough for food names."""
+    if len(word) <= 3 or word in _NOT_PLURAL:
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word in _VES_TO_F:
+        return _VES_TO_F[word]
+    if word.endswith(_ES_ENDINGS):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name):
+    """Fold case, accents, punctuation and whitespace, and singularize each word."""
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    words = re.sub(r'[^a-z0-9]+', ' ', name).split()
+    return ' '.join(singularize(word) for word in words)
+
+
+def trigrams(text):
+    """Trigram set of a normalized string, padded per word like pg_trgm."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """Jaccard similarity of the trigram sets of two normalized strings (0-1)."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def best_match(normalized, candidates, threshold, multiword_threshold=None):
+    """Pick the (key, normalized) candidate most similar to `normalized`, if any reaches threshold.
+
+    Ties go to the earlier candidate, so callers can list preferred ones first.
+    Fuzzy matches must have the same number of words and share the last one
+    (the head noun): a modifier usually makes a different food, so "olive oil",
+    "ice cream" and "red pepper" never reuse the icons for "olive", "cream"
+    and "pepper". Multi-word names must reach multiword_threshold (default
+    threshold), since a shared head noun already makes them look alike.
+    """
+    words = normalized.split()
+    if len(words) > 1 and multiword_threshold is not None:
+        threshold = max(threshold, multiword_threshold)
+    best_key, best_score = None, 0.0
+    for key, candidate in candidates:
+        if candidate == normalized:
+            return key
+        candidate_words = candidate.split()
+        if len(candidate_words) != len(words) or candidate_words[-1:] != words[-1:]:
+            continue
+        score = similarity(normalized, candidate)
+        if score >= threshold and score > best_score:
+            best_key, best_score = key, score
+    return best_key
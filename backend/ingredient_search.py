@@ -0,0 +1,124 @@
+# ingredient_search.py
+import re
+
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.exc import DatabaseError
+
+from db import db, Ingredient
+
+SQLITE_FTS_STATEMENTS = (
+    # owner holds "u<user_id>" so a user's rows are found through the index too
+    """CREATE VIRTUAL TABLE ingredients_fts USING fts5(
+        name, owner, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS ingredients_fts_insert AFTER INSERT ON ingredients BEGIN
+        INSERT INTO ingredients_fts(rowid, name, owner) VALUES (new.id, new.name, 'u' || new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ingredients_fts_delete AFTER DELETE ON ingredients BEGIN
+        DELETE FROM ingredients_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ingredients_fts_update AFTER UPDATE OF name, user_id ON ingredients BEGIN
+        DELETE FROM ingredients_fts WHERE rowid = old.id;
+        INSERT INTO ingredients_fts(rowid, name, owner) VALUES (new.id, new.name, 'u' || new.user_id);
+    END""",
+    # Rows a trigger already indexed are skipped
+    """INSERT INTO ingredients_fts(rowid, name, owner)
+        SELECT id, name, 'u' || user_id FROM ingredients WHERE id NOT IN (SELECT rowid FROM ingredients_fts)""",
+)
+
+POSTGRES_TRGM_STATEMENTS = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_ingredients_name_trgm ON ingredients USING gin (lower(name) gin_trgm_ops)",
+)
+
+
+class IngredientSearch:
+    """Ranked ingredient name search for the typeahead.
+
+    Postgres uses pg_trgm (a GIN trigram index on lower(name), ranked by
+    similarity); SQLite uses an FTS5 table kept in sync by triggers, matched
+    by word prefix and ranked by bm25. Names starting with the query always
+    rank first. Without either, a LIKE scan is used.
+    """
+
+    def __init__(self):
+        self.engine = 'like'
+
+    def ensure_index(self):
+        """Create the search index if missing and pick the engine. Call at startup."""
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'postgresql':
+                with db.engine.begin() as conn:
+                    for statement in POSTGRES_TRGM_STATEMENTS:
+                        conn.execute(text(statement))
+                self.engine = 'trigram'
+            elif dialect == 'sqlite':
+                with db.engine.begin() as conn:
+                    if not search_index_exists(conn, 'ingredients_fts'):
+                        for statement in SQLITE_FTS_STATEMENTS:
+                            conn.execute(text(statement))
+                self.engine = 'fts5'
+        except DatabaseError:
+            # No pg_trgm privilege or no FTS5 in this SQLite build, or another
+            # worker process was creating the index at the same time
+            with db.engine.connect() as conn:
+                if search_index_exists(conn, 'ix_ingredients_name_trgm' if dialect == 'postgresql' else 'ingredients_fts'):
+                    self.engine = 'trigram' if dialect == 'postgresql' else 'fts5'
+
+    def search(self, user_id, query, category=None, limit=None, offset=0):
+        """Ingredients of user_id matching query, best match first."""
+        query = query.strip().lower()
+        stmt = select(Ingredient).where(Ingredient.user_id == user_id)
+        if category:
+            stmt = stmt.where(func.lower(Ingredient.category).like(f"{escape_like(category.strip().lower())}%", escape='\\'))
+
+        name = func.lower(Ingredient.name)
+        if not query:
+            stmt = stmt.order_by(Ingredient.id)
+        elif self.engine == 'fts5':
+            words = re.findall(r'\w+', query)
+            if not words:
+                return []
+            match = f'owner:u{user_id} AND ' + ' AND '.join(f'name:"{word}"*' for word in words)
+            fts = text(
+                "SELECT rowid AS ingredient_id, bm25(ingredients_fts) AS rank FROM ingredients_fts"
+                " WHERE ingredients_fts MATCH :match"
+            ).bindparams(match=match).columns(ingredient_id=db.Integer, rank=db.Float).subquery('fts')
+            stmt = (
+                stmt.join(fts, fts.c.ingredient_id == Ingredient.id)
+                .order_by(name.like(f"{escape_like(query)}%", escape='\\').desc(), fts.c.rank, Ingredient.name)
+            )
+        else:
+            contains = name.like(f"%{escape_like(query)}%", escape='\\')
+            prefix = name.like(f"{escape_like(query)}%", escape='\\')
+            if self.engine == 'trigram':
+                # Both conditions are answered by the trigram index; % also catches typos
+                stmt = stmt.where(or_(contains, name.op('%')(query))).order_by(
+                    prefix.desc(), func.similarity(name, query).desc(), Ingredient.name
+                )
+            else:
+                stmt = stmt.where(contains).order_by(prefix.desc(), Ingredient.name)
+
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        if offset:
+            stmt = stmt.offset(offset)
+        return db.session.scalars(stmt).all()
+
+
+def search_index_exists(conn, name):
+    """Whether a Postgres index or a SQLite (FTS) table called name exists."""
+    if conn.dialect.name == 'postgresql':
+        query = "SELECT 1 FROM pg_indexes WHERE indexname = :name"
+    else:
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    return conn.execute(text(query), {'name': name}).first() is not None
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# Initialize singleton
+ingredient_search = IngredientSearch()
@@ -0,0 +1,91 @@
+# local_storage.py
+import mimetypes
+import os
+import shutil
+import tempfile
+from werkzeug.security import safe_join
+
+from storage_backend import StorageBackend
+
+COPY_CHUNK_BYTES = 256 * 1024
+
+
+class LocalStorage(StorageBackend):
+    """Icons stored as files under a base directory.
+
+    Writes stream into a temporary file in the destination directory and are
+    renamed into place, so a reader never sees a half-written icon.
+    """
+
+    def __init__(self, base_path):
+        self.base_path = os.path.abspath(base_path)
+
+    def path(self, key):
+        """Absolute path of a key, or None if the key escapes the base directory."""
+        return safe_join(self.base_path, key)
+
+    def _upload(self, file_obj, key, content_type, cache_control=None):
+        path = self.path(key)
+        if path is None:
+            raise ValueError(f"Invalid storage key: {key}")
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        if file_obj.seekable():
+            file_obj.seek(0)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(file_obj, f, COPY_CHUNK_BYTES)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return True
+
+    def exists(self, key):
+        path = self.path(key)
+        return path is not None and os.path.isfile(path)
+
+    def find_extension(self, base_key, extensions):
+        """First of extensions under which base_key is stored, or None."""
+        for ext in extensions:
+            if self.exists(f"{base_key}{ext}"):
+                return ext
+        return None
+
+    def _delete(self, key):
+        path = self.path(key)
+        if path is None:
+            return False
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def read(self, key):
+        """(bytes, content_type) stored under key, or None."""
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read(), mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        except FileNotFoundError:
+            return None
+
+    def list_keys(self, prefix=''):
+        root_dir = self.path(prefix) if prefix else self.base_path
+        if root_dir is None:
+            return
+        for root, _, files in os.walk(root_dir):
+            for filename in files:
+                if filename.startswith('.upload-'):
+                    continue
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, self.base_path).replace(os.sep, '/')
@@ -0,0 +1,47 @@
+# query_stats.py
+import os
+import threading
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Counts SQL statements per request.
+
+    Each response carries its count in X-DB-Queries, and per-endpoint totals
+    are kept for /metrics. Statements run outside a request (icon worker,
+    CLI commands) or after the response has started streaming aren't counted.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('QUERY_COUNTER_ENABLED', 'true').lower() == 'true'
+        self._lock = threading.Lock()
+        self._endpoints = {}  # endpoint -> {'requests': n, 'queries': n}
+
+    def init_app(self, app, engine):
+        if not self.enabled:
+            return
+        event.listen(engine, 'before_cursor_execute', self._count)
+        app.after_request(self._report)
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(totals) for endpoint, totals in self._endpoints.items()}
+
+    def _count(self, *args):
+        if has_request_context():
+            g.db_queries = g.get('db_queries', 0) + 1
+
+    def _report(self, response):
+        queries = g.get('db_queries', 0)
+        response.headers['X-DB-Queries'] = str(queries)
+        with self._lock:
+            totals = self._endpoints.setdefault(request.endpoint or 'unknown', {'requests': 0, 'queries': 0})
+            totals['requests'] += 1
+            totals['queries'] += queries
+        return response
+
+
+# Initialize singleton
+query_counter = QueryCounter()
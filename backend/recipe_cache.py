@@ -0,0 +1,113 @@
+# recipe_cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from db import db, RecipeCacheEntry
+
+
+class RecipeCache:
+    """Two-tier cache of recipe suggestions keyed by a hash of the prompt.
+
+    The in-process LRU answers repeat requests on the same worker; the
+    optional recipe_cache table lets every gunicorn worker share entries.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('RECIPE_CACHE_ENABLED', 'true').lower() == 'true'
+        self.shared = os.getenv('RECIPE_CACHE_SHARED', 'true').lower() == 'true'
+        self.ttl = int(os.getenv('RECIPE_CACHE_TTL_SECONDS', '86400'))
+        self.max_entries = int(os.getenv('RECIPE_CACHE_MAX_ENTRIES', '256'))
+        self.max_shared_entries = int(os.getenv('RECIPE_CACHE_MAX_SHARED_ENTRIES', '10000'))
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (user_id, expires_at monotonic, recipes)
+
+    @staticmethod
+    def make_key(prompt, model):
+        normalized = ' '.join(prompt.lower().split())
+        return hashlib.sha256(f"{model}\n{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return entry[2]
+                del self._entries[key]
+
+        if not self.shared:
+            return None
+
+        row = db.session.get(RecipeCacheEntry, key)
+        if row is None:
+            return None
+
+        # DateTime columns come back naive (UTC)
+        remaining = (row.expires_at - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+        if remaining <= 0:
+            return None
+
+        self._remember(key, row.user_id, row.recipes, remaining)
+        return row.recipes
+
+    def set(self, key, user_id, recipes):
+        if not self.enabled:
+            return
+
+        self._remember(key, user_id, recipes, self.ttl)
+
+        if not self.shared:
+            return
+
+        now = datetime.now(timezone.utc)
+        try:
+            db.session.merge(RecipeCacheEntry(
+                key=key,
+                user_id=user_id,
+                recipes=recipes,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl),
+            ))
+            self._evict_shared(now)
+            db.session.commit()
+        except Exception:
+            # A cache write must never fail the request that produced the recipes
+            db.session.rollback()
+
+    def invalidate_user(self, user_id):
+        """Drop every entry built from this user's pantry. Runs in the caller's transaction."""
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[0] == user_id]:
+                del self._entries[key]
+
+        if self.enabled and self.shared:
+            db.session.execute(delete(RecipeCacheEntry).where(RecipeCacheEntry.user_id == user_id))
+
+    def _remember(self, key, user_id, recipes, ttl):
+        with self._lock:
+            self._entries[key] = (user_id, time.monotonic() + ttl, recipes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _evict_shared(self, now):
+        db.session.execute(delete(RecipeCacheEntry).where(RecipeCacheEntry.expires_at <= now))
+
+        overflow = db.session.scalar(select(db.func.count()).select_from(RecipeCacheEntry)) - self.max_shared_entries
+        if overflow > 0:
+            oldest = select(RecipeCacheEntry.key).order_by(RecipeCacheEntry.created_at).limit(overflow)
+            db.session.execute(delete(RecipeCacheEntry).where(RecipeCacheEntry.key.in_(oldest)))
+
+
+# Initialize singleton
+recipe_cache = RecipeCache()
@@ -0,0 +1,148 @@
+# recipe_search.py
+import html
+import re
+
+from sqlalchemy import func, literal_column, or_, select, text
+from sqlalchemy.exc import DatabaseError
+from sqlalchemy.orm import load_only
+
+from db import db, Recipe
+from ingredient_search import escape_like, search_index_exists
+
+# The database marks matches with control characters, which recipe text never
+# contains; the snippet is then HTML-escaped and they become <mark> tags, so
+# markdown in the body (e.g. **bold**) can't be mistaken for a highlight
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+SNIPPET_CHARS = 200
+
+SQLITE_FTS_STATEMENTS = (
+    # External content: the text stays in recipes, the FTS table only holds the index
+    """CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+        name, recipe, user_id, content='recipes', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipes_fts(rowid, name, recipe, user_id) VALUES (new.id, new.name, new.recipe, new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, name, recipe, user_id)
+            VALUES ('delete', old.id, old.name, old.recipe, old.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE OF name, recipe, user_id ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, name, recipe, user_id)
+            VALUES ('delete', old.id, old.name, old.recipe, old.user_id);
+        INSERT INTO recipes_fts(rowid, name, recipe, user_id) VALUES (new.id, new.name, new.recipe, new.user_id);
+    END""",
+)
+
+# The query must repeat this expression exactly for Postgres to use the index
+POSTGRES_DOCUMENT = "to_tsvector('english', coalesce(recipes.name, '') || ' ' || recipes.recipe)"
+POSTGRES_STATEMENTS = (
+    f"CREATE INDEX IF NOT EXISTS ix_recipes_search ON recipes USING gin ({POSTGRES_DOCUMENT})",
+)
+
+
+class RecipeSearch:
+    """Full-text search over saved recipe names and bodies.
+
+    Postgres uses a GIN index on a tsvector of name and body, ranked with
+    ts_rank_cd and highlighted with ts_headline; SQLite uses an
+    external-content FTS5 table kept in sync by triggers, ranked by bm25 with
+    the name weighted above the body. Without either, a LIKE scan is used.
+    """
+
+    def __init__(self):
+        self.engine = 'like'
+
+    def ensure_index(self):
+        """Create the search index if missing and pick the engine. Call at startup."""
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'postgresql':
+                with db.engine.begin() as conn:
+                    for statement in POSTGRES_STATEMENTS:
+                        conn.execute(text(statement))
+                self.engine = 'tsvector'
+            elif dialect == 'sqlite':
+                with db.engine.begin() as conn:
+                    exists = search_index_exists(conn, 'recipes_fts')
+                    for statement in SQLITE_FTS_STATEMENTS:
+                        conn.execute(text(statement))
+                    if not exists:
+                        # Index the recipes saved before the table existed
+                        conn.execute(text("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')"))
+                self.engine = 'fts5'
+        except DatabaseError:
+            # No FTS5 in this SQLite build, or another worker process was
+            # creating the index at the same time
+            with db.engine.connect() as conn:
+                if search_index_exists(conn, 'ix_recipes_search' if dialect == 'postgresql' else 'recipes_fts'):
+                    self.engine = 'tsvector' if dialect == 'postgresql' else 'fts5'
+
+    def search(self, user_id, query, limit, offset=0):
+        """[(recipe, snippet)] of user_id's recipes matching query, best match first."""
+        query = query.strip()
+        if not query:
+            return []
+        stmt = (
+            select(Recipe)
+            .options(load_only(Recipe.name, Recipe.created_at, Recipe.updated_at, Recipe.user_id))
+            .where(Recipe.user_id == user_id)
+        )
+
+        if self.engine == 'fts5':
+            words = re.findall(r'\w+', query.lower())
+            if not words:
+                return []
+            match = f'user_id:{user_id} AND {{name recipe}} : (' + ' AND '.join(f'"{word}"*' for word in words) + ')'
+            fts = text(
+                "SELECT rowid AS recipe_id, bm25(recipes_fts, 4.0, 1.0, 0.0) AS rank,"
+                " snippet(recipes_fts, 1, :start, :stop, '…', 24) AS snippet"
+                " FROM recipes_fts WHERE recipes_fts MATCH :match"
+            ).bindparams(
+                match=match, start=HIGHLIGHT_START, stop=HIGHLIGHT_STOP,
+            ).columns(recipe_id=db.Integer, rank=db.Float, snippet=db.Text).subquery('fts')
+            stmt = (
+                stmt.add_columns(fts.c.snippet)
+                .join(fts, fts.c.recipe_id == Recipe.id)
+                .order_by(fts.c.rank, Recipe.created_at.desc())
+            )
+        elif self.engine == 'tsvector':
+            document = literal_column(POSTGRES_DOCUMENT)
+            tsquery = func.websearch_to_tsquery('english', query)
+            snippet = func.ts_headline(
+                'english', Recipe.recipe, tsquery,
+                f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxFragments=2, MaxWords=24, MinWords=8',
+            )
+            stmt = (
+                stmt.add_columns(snippet)
+                .where(document.op('@@')(tsquery))
+                .order_by(func.ts_rank_cd(document, tsquery).desc(), Recipe.created_at.desc())
+            )
+        else:
+            pattern = f"%{escape_like(query.lower())}%"
+            stmt = (
+                stmt.add_columns(func.substr(Recipe.recipe, 1, SNIPPET_CHARS))
+                .where(or_(
+                    func.lower(Recipe.name).like(pattern, escape='\\'),
+                    func.lower(Recipe.recipe).like(pattern, escape='\\'),
+                ))
+                .order_by(Recipe.created_at.desc())
+            )
+
+        stmt = stmt.limit(limit)
+        if offset:
+            stmt = stmt.offset(offset)
+        return [(row[0], render_snippet(row[1])) for row in db.session.execute(stmt).all()]
+
+
+def render_snippet(snippet):
+    """HTML-escaped snippet with the matched words in <mark> tags."""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+
+# Initialize singleton
+recipe_search = RecipeSearch()
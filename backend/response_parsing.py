@@ -0,0 +1,171 @@
+# response_parsing.py
+import json
+import math
+import re
+import xml.etree.ElementTree as ET
+
+_FENCE = re.compile(r"```(?:json|svg|xml)?\s*(.*?)(?:```|$)", re.DOTALL)
+_decoder = json.JSONDecoder()
+
+# Forced tool call for scans: the API hands back the arguments already parsed
+SCAN_ITEMS_TOOL = {
+    "name": "report_items",
+    "description": "Report the food items found in the image.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "items": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "category": {"type": "string"},
+                        "bbox": {
+                            "type": "array",
+                            "items": {"type": "number"},
+                            "minItems": 4,
+                            "maxItems": 4,
+                        },
+                    },
+                    "required": ["name"],
+                },
+            },
+        },
+        "required": ["items"],
+    },
+}
+
+
+def response_text(response):
+    """Concatenate the text blocks of a Messages API response."""
+    return ''.join(block.text for block in response.content if block.type == 'text')
+
+
+def tool_input(response, tool_name):
+    """Arguments of the first call to tool_name in a response, or None."""
+    for block in response.content:
+        if block.type == 'tool_use' and block.name == tool_name:
+            return block.input
+    return None
+
+
+def _candidates(text):
+    # Fenced blocks first, then the raw text
+    yield from (match.group(1) for match in _FENCE.finditer(text))
+    yield text
+
+
+def extract_json_object(text):
+    """First JSON object embedded in text, ignoring fences and surrounding prose."""
+    for candidate in _candidates(text):
+        for start in (m.start() for m in re.finditer(r'\{', candidate)):
+            try:
+                value, _ = _decoder.raw_decode(candidate, start)
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                return value
+    return None
+
+
+def extract_json_array_items(text, key):
+    """Elements of the array under "key", read one at a time.
+
+    Elements are decoded individually, so output that was cut off (e.g. by
+    max_tokens) or broken part way through still yields everything before
+    the damage.
+    """
+    match = re.search(r'"%s"\s*:\s*\[' % re.escape(key), text)
+    if match is None:
+        return []
+
+    values, pos = [], match.end()
+    while True:
+        while pos < len(text) and text[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(text) or text[pos] == ']':
+            return values
+        try:
+            value, pos = _decoder.raw_decode(text, pos)
+        except ValueError:
+            return values
+        values.append(value)
+
+
+def _clean_bbox(bbox):
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        return None
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in bbox):
+        return None
+    x1, y1, x2, y2 = (min(max(float(v), 0.0), 100.0) for v in bbox)
+    x1, x2 = sorted((x1, x2))
+    y1, y2 = sorted((y1, y2))
+    if x1 == x2 or y1 == y2:
+        return None
+    return [x1, y1, x2, y2]
+
+
+def validate_scan_items(raw_items):
+    """Keep well-formed scan items; returns (items, dropped).
+
+    Items need a non-empty name; category defaults to ''. A bad bbox is
+    replaced by None (the item is still usable) and values are clamped to 0-100.
+    """
+    if not isinstance(raw_items, list):
+        return [], 1
+
+    items, dropped = [], 0
+    for raw in raw_items:
+        name = raw.get('name') if isinstance(raw, dict) else None
+        if not isinstance(name, str) or not name.strip():
+            dropped += 1
+            continue
+        category = raw.get('category')
+        items.append({
+            'name': name.strip().lower()[:100],
+            'category': category.strip().lower()[:50] if isinstance(category, str) else '',
+            'bbox': _clean_bbox(raw.get('bbox')),
+        })
+    return items, dropped
+
+
+def parse_scan_items(response):
+    """Items from a scan response; returns (items, partial).
+
+    Prefers the report_items tool call and falls back to JSON in the text.
+    partial is True when the output was truncated or some of it was unusable.
+    """
+    truncated = response.stop_reason == 'max_tokens'
+
+    arguments = tool_input(response, SCAN_ITEMS_TOOL['name'])
+    if arguments is not None:
+        raw_items = arguments.get('items', []) if isinstance(arguments, dict) else None
+    else:
+        text = response_text(response)
+        parsed = extract_json_object(text)
+        if parsed is not None and 'items' in parsed:
+            raw_items = parsed['items']
+        else:
+            raw_items = extract_json_array_items(text, 'items')
+            truncated = True
+
+    items, dropped = validate_scan_items(raw_items)
+    return items, truncated or dropped > 0
+
+
+def extract_svg(text):
+    """The complete, well-formed <svg> element in text, or None."""
+    start = text.find('<svg')
+    end = text.rfind('</svg>')
+    if start == -1 or end < start:
+        return None
+
+    svg = text[start:end + len('</svg>')]
+    try:
+        root = ET.fromstring(svg)
+    except ET.ParseError:
+        return None
+    if root.tag.rsplit('}', 1)[-1] != 'svg':
+        return None
+    return svg
@@ -0,0 +1,91 @@
+# scan_cache.py
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+
+from db import db, ScanCacheEntry
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+class ScanCache:
+    """Per-user cache of image scan results keyed by a perceptual hash.
+
+    A photo whose hash is within max_distance bits of a recent scan of the
+    same type by the same user gets that scan's items back without a model
+    call. Entries live in the scan_cache table so every worker shares them.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('SCAN_CACHE_ENABLED', 'true').lower() == 'true'
+        self.ttl = int(os.getenv('SCAN_CACHE_TTL_SECONDS', '3600'))
+        self.max_distance = int(os.getenv('SCAN_CACHE_MAX_DISTANCE', '6'))
+        self.max_per_user = int(os.getenv('SCAN_CACHE_MAX_PER_USER', '20'))
+
+    def get(self, user_id, scan_type, image_hash):
+        if not self.enabled:
+            return None
+
+        rows = db.session.execute(
+            select(ScanCacheEntry.image_hash, ScanCacheEntry.items)
+            .where(
+                ScanCacheEntry.user_id == user_id,
+                ScanCacheEntry.scan_type == scan_type,
+                ScanCacheEntry.expires_at > datetime.now(timezone.utc),
+            )
+            .order_by(ScanCacheEntry.created_at.desc())
+            .limit(self.max_per_user)
+        ).all()
+
+        best = min(rows, key=lambda row: hamming_distance(row.image_hash, image_hash), default=None)
+        if best is None or hamming_distance(best.image_hash, image_hash) > self.max_distance:
+            return None
+        return json.loads(best.items)
+
+    def set(self, user_id, scan_type, image_hash, items):
+        if not self.enabled:
+            return
+
+        now = datetime.now(timezone.utc)
+        try:
+            db.session.add(ScanCacheEntry(
+                user_id=user_id,
+                scan_type=scan_type,
+                image_hash=image_hash,
+                items=json.dumps(items),
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl),
+            ))
+            db.session.flush()
+            self._evict(user_id, scan_type, now)
+            db.session.commit()
+        except Exception:
+            # A cache write must never fail the scan that produced the items
+            db.session.rollback()
+
+    def invalidate_user(self, user_id):
+        """Drop every entry of this user. Runs in the caller's transaction."""
+        db.session.execute(delete(ScanCacheEntry).where(ScanCacheEntry.user_id == user_id))
+
+    def _evict(self, user_id, scan_type, now):
+        db.session.execute(delete(ScanCacheEntry).where(ScanCacheEntry.expires_at <= now))
+
+        keep = (
+            select(ScanCacheEntry.id)
+            .where(ScanCacheEntry.user_id == user_id, ScanCacheEntry.scan_type == scan_type)
+            .order_by(ScanCacheEntry.created_at.desc())
+            .limit(self.max_per_user)
+        )
+        db.session.execute(delete(ScanCacheEntry).where(
+            ScanCacheEntry.user_id == user_id,
+            ScanCacheEntry.scan_type == scan_type,
+            ScanCacheEntry.id.not_in(keep.scalar_subquery()),
+        ))
+
+
+# Initialize singleton
+scan_cache = ScanCache()
@@ -0,0 +1,86 @@
+# storage_backend.py
+import threading
+
+from asset_index import asset_index
+
+
+class StorageBackend:
+    """Interface shared by the local, S3/R2 and in-memory icon stores.
+
+    Subclasses implement the single-key operations (_upload, exists, _delete,
+    list_keys, read) and may replace _delete_many with a native batch call.
+    """
+
+    use_cloud = False
+
+    def upload_image(self, file_obj, key, content_type='image/png', cache_control=None):
+        """Store file_obj under key. Returns True on success.
+
+        cache_control overrides the CDN's one-year default for objects that
+        are replaced under the same key.
+        """
+        asset_index.forget(key)
+        return self._upload(file_obj, key, content_type, cache_control)
+
+    def delete(self, key):
+        """Delete key. Returns True if something was deleted."""
+        asset_index.forget(key)
+        return self._delete(key)
+
+    def delete_many(self, keys):
+        """Delete keys. Returns the keys that could not be deleted."""
+        keys = list(keys)
+        for key in keys:
+            asset_index.forget(key)
+        return self._delete_many(keys)
+
+    def _delete_many(self, keys):
+        # A missing key counts as deleted
+        for key in keys:
+            self._delete(key)
+        return []
+
+    def get_url(self, key):
+        """Get public URL for the file"""
+        # Served by the app's asset route
+        return f"/api/assets/{key}"
+
+
+class MemoryStorage(StorageBackend):
+    """Process-local store for tests and load runs without disk or network."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._objects = {}  # key -> (bytes, content_type)
+
+    def _upload(self, file_obj, key, content_type, cache_control=None):
+        if file_obj.seekable():
+            file_obj.seek(0)
+        data = file_obj.read()
+        with self._lock:
+            self._objects[key] = (data, content_type)
+        return True
+
+    def exists(self, key):
+        with self._lock:
+            return key in self._objects
+
+    def _delete(self, key):
+        with self._lock:
+            return self._objects.pop(key, None) is not None
+
+    def _delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._objects.pop(key, None)
+        return []
+
+    def read(self, key):
+        """(bytes, content_type) stored under key, or None."""
+        with self._lock:
+            return self._objects.get(key)
+
+    def list_keys(self, prefix=''):
+        with self._lock:
+            keys = [key for key in self._objects if key.startswith(prefix)]
+        yield from sorted(keys)
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py reads its configuration at import time
+_db_dir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_db_dir, 'test.db')}")
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('ICON_WORKER_ENABLED', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app():
+    from app import app
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    """(user_id, auth headers) of a fresh user."""
+    from app import generate_token
+    from db import db, User
+
+    with app.app_context():
+        user = User(username=f"user{os.urandom(4).hex()}", email=f"{os.urandom(4).hex()}@example.com")
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user.id, {'Authorization': f"Bearer {generate_token(user.id)}"}
@@ -0,0 +1,40 @@
+from io import BytesIO
+
+from claude_icon_utils import build_storage_key, link_icon_alias, set_icon_stored
+from cloud_storage_config import storage
+
+
+def test_aliased_icon_is_served_from_its_target(client, app):
+    target = build_storage_key('cherry tomato', 'vegetable')
+    storage.upload_image(BytesIO(b'<svg/>'), target, content_type='image/svg+xml')
+    with app.app_context():
+        set_icon_stored(target, 'cherry tomato', 'vegetable', 'ingredient', True)
+        link_icon_alias(build_storage_key('cherry tomatoes', 'vegetable'), 'cherry tomatoes', 'vegetable', 'ingredient', target)
+
+    response = client.get('/api/assets/ingredients/generated_images/cherry tomatoes_vegetable')
+
+    assert response.status_code == 200
+    assert response.data == b'<svg/>'
+
+
+def test_scan_icon_is_revalidated_but_generated_icon_is_cached(client, app):
+    storage.upload_image(BytesIO(b'png'), 'ingredients/generated_images/7_basil.png', cache_control='no-cache')
+    storage.upload_image(BytesIO(b'<svg/>'), 'ingredients/generated_images/basil.svg', content_type='image/svg+xml')
+
+    scan_icon = client.get('/api/assets/ingredients/generated_images/7_basil')
+    assert scan_icon.status_code == 200
+    assert scan_icon.headers['Cache-Control'] == 'no-cache'
+    assert client.get(
+        '/api/assets/ingredients/generated_images/7_basil',
+        headers={'If-None-Match': scan_icon.headers['ETag']},
+    ).status_code == 304
+
+    storage.upload_image(BytesIO(b'new png'), 'ingredients/generated_images/7_basil.png', cache_control='no-cache')
+    replaced = client.get(
+        '/api/assets/ingredients/generated_images/7_basil',
+        headers={'If-None-Match': scan_icon.headers['ETag']},
+    )
+    assert replaced.status_code == 200 and replaced.data == b'new png'
+
+    icon = client.get('/api/assets/ingredients/generated_images/basil')
+    assert 'max-age' in icon.headers['Cache-Control']
@@ -0,0 +1,83 @@
+import pytest
+
+
+def post_bulk(client, user_id, headers, kind, body):
+    return client.post(f'/api/users/{user_id}/{kind}/bulk/', json=body, headers=headers)
+
+
+def test_bulk_ingredients_are_created_with_icon_jobs(client, user):
+    user_id, headers = user
+    response = post_bulk(client, user_id, headers, 'ingredients', {'items': [
+        {'name': ' Turnip ', 'category': 'Vegetable', 'quantity': 2, 'unit': 'pcs'},
+        {'name': 'saffron', 'quantity': 0.5},
+    ]})
+
+    assert response.status_code == 201
+    data = response.get_json()['data']
+    assert [(item['name'], item['category'], item['quantity']) for item in data] == [
+        ('turnip', 'vegetable', 2), ('saffron', '', 0.5),
+    ]
+    assert all('icon_job_id' in item for item in data)
+
+    listed = client.get(f'/api/users/{user_id}/ingredients/', headers=headers).get_json()['data']
+    assert {item['name'] for item in listed} == {'turnip', 'saffron'}
+
+
+def test_bulk_allergies_are_created(client, user):
+    user_id, headers = user
+    response = post_bulk(client, user_id, headers, 'allergies', {'items': [
+        {'allergy_name': 'Peanut', 'allergy_category': 'Nut'},
+        {'allergy_name': 'shellfish'},
+    ]})
+
+    assert response.status_code == 201
+    assert [item['allergy_name'] for item in response.get_json()['data']] == ['peanut', 'shellfish']
+
+
+@pytest.mark.parametrize('item', [
+    {'name': 5},
+    {'name': 'kale', 'unit': 5},
+    {'name': 'kale', 'category': ['leafy']},
+    {'name': 'kale', 'quantity': 'lots'},
+    {'name': 'kale', 'quantity': True},
+])
+def test_bulk_ingredient_with_wrong_type_is_400(client, user, item):
+    user_id, headers = user
+    response = post_bulk(client, user_id, headers, 'ingredients', {'items': [{'name': 'leek'}, item]})
+
+    assert response.status_code == 400
+    assert '(item 1)' in response.get_json()['error']
+    # Nothing from the batch is saved
+    assert client.get(f'/api/users/{user_id}/ingredients/', headers=headers).get_json()['data'] == []
+
+
+@pytest.mark.parametrize('item', [{'allergy_name': 5}, {'allergy_name': 'soy', 'allergy_category': 1}])
+def test_bulk_allergy_with_wrong_type_is_400(client, user, item):
+    user_id, headers = user
+    response = post_bulk(client, user_id, headers, 'allergies', {'items': [item]})
+
+    assert response.status_code == 400
+    assert '(item 0)' in response.get_json()['error']
+
+
+def test_bulk_size_is_capped(client, user, app):
+    user_id, headers = user
+    too_many = [{'name': f'item {i}'} for i in range(app.config['MAX_BULK_ITEMS'] + 1)]
+
+    assert post_bulk(client, user_id, headers, 'ingredients', {'items': too_many}).status_code == 400
+    assert post_bulk(client, user_id, headers, 'ingredients', {'items': []}).status_code == 400
+    assert post_bulk(client, user_id, headers, 'allergies', {'items': 'peanut'}).status_code == 400
+
+
+def test_bulk_skip_icon(client, user):
+    user_id, headers = user
+    response = post_bulk(client, user_id, headers, 'ingredients', {'items': [
+        {'name': 'fennel', 'skip_icon': True},
+        {'name': 'celeriac'},
+    ]})
+    data = response.get_json()['data']
+    assert 'icon_job_id' not in data[0]
+    assert 'icon_job_id' in data[1]
+
+    response = post_bulk(client, user_id, headers, 'allergies', {'skip_icon': True, 'items': [{'allergy_name': 'sesame'}]})
+    assert 'icon_job_id' not in response.get_json()['data'][0]
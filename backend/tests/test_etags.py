@@ -0,0 +1,55 @@
+def test_unchanged_list_revalidates_with_304(client, user):
+    user_id, headers = user
+    url = f'/api/users/{user_id}/allergies/'
+    client.post(url, json={'allergy_name': 'lupin', 'skip_icon': True}, headers=headers)
+
+    first = client.get(url, headers=headers)
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    revalidated = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+
+    # A strong copy of the tag matches too
+    assert client.get(url, headers={**headers, 'If-None-Match': etag[2:]}).status_code == 304
+
+
+def test_write_changes_the_etag(client, user):
+    user_id, headers = user
+    url = f'/api/users/{user_id}/ingredients/'
+    etag = client.get(url, headers=headers).headers['ETag']
+
+    client.post(url, json={'name': 'chard', 'skip_icon': True}, headers=headers)
+
+    changed = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert [item['name'] for item in changed.get_json()['data']] == ['chard']
+
+
+def test_each_collection_has_its_own_etag(client, user):
+    user_id, headers = user
+    ingredients = client.get(f'/api/users/{user_id}/ingredients/', headers=headers).headers['ETag']
+
+    allergies = client.get(f'/api/users/{user_id}/allergies/', headers={**headers, 'If-None-Match': ingredients})
+    assert allergies.status_code == 200
+    assert allergies.headers['ETag'] != ingredients
+
+
+def test_single_ingredient_revalidates_until_updated(client, user):
+    user_id, headers = user
+    created = client.post(
+        f'/api/users/{user_id}/ingredients/', json={'name': 'kohlrabi', 'skip_icon': True}, headers=headers
+    ).get_json()['data']
+    url = f"/api/users/{user_id}/ingredients/{created['id']}/"
+
+    etag = client.get(url, headers=headers).headers['ETag']
+    assert client.get(url, headers={**headers, 'If-None-Match': etag}).status_code == 304
+
+    client.put(url, json={'name': 'kohlrabi', 'quantity': 3}, headers=headers)
+    updated = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert updated.status_code == 200
+    assert updated.get_json()['data']['quantity'] == 3
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+from claude_icon_utils import build_storage_key, set_icon_stored
+from db import db, IconJob
+from icon_jobs import icon_worker
+
+
+def add_ingredient(client, user_id, headers, name):
+    response = client.post(f'/api/users/{user_id}/ingredients/', json={'name': name}, headers=headers)
+    assert response.status_code == 201
+    return response.get_json()['data']
+
+
+def test_icon_job_is_only_visible_to_its_owner(client, user, app):
+    user_id, headers = user
+    job_id = add_ingredient(client, user_id, headers, 'kohlrabi')['icon_job_id']
+
+    assert client.get(f'/api/icon-jobs/{job_id}/', headers=headers).status_code == 200
+
+    from app import generate_token
+    with app.app_context():
+        from db import User
+        stranger = User(username='stranger', email='stranger@example.com')
+        stranger.set_password('password')
+        db.session.add(stranger)
+        db.session.commit()
+        other = {'Authorization': f"Bearer {generate_token(stranger.id)}"}
+    assert client.get(f'/api/icon-jobs/{job_id}/', headers=other).status_code == 404
+
+
+def test_stored_icon_is_not_queued(client, user, app):
+    user_id, headers = user
+    with app.app_context():
+        set_icon_stored(build_storage_key('parsnip', ''), 'parsnip', '', 'ingredient', True)
+
+    assert 'icon_job_id' not in add_ingredient(client, user_id, headers, 'parsnip')
+
+
+def test_prune_removes_old_finished_jobs(app):
+    old = datetime.now(timezone.utc) - timedelta(seconds=icon_worker.retention + 60)
+    with app.app_context():
+        kept = IconJob(name='a', icon_type='ingredient', storage_key='a', status='pending', updated_at=old)
+        pruned = IconJob(name='b', icon_type='ingredient', storage_key='b', status='done', updated_at=old)
+        db.session.add_all([kept, pruned])
+        db.session.commit()
+        kept_id, pruned_id = kept.id, pruned.id
+
+        icon_worker._last_prune = 0.0
+        icon_worker._prune_finished()
+
+        assert db.session.get(IconJob, kept_id) is not None
+        assert db.session.get(IconJob, pruned_id) is None
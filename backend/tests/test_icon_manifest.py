@@ -0,0 +1,24 @@
+from claude_icon_utils import add_icon_refs, build_storage_key, pin_icons, release_icon_refs, rebuild_icon_manifest
+from db import db, IconManifest
+
+
+def test_releasing_last_ref_deletes_unpinned_icon(app):
+    with app.app_context():
+        add_icon_refs([('saffron', 'spice')], 'ingredient')
+        assert release_icon_refs([('saffron', 'spice')], 'ingredient') == [build_storage_key('saffron', 'spice')]
+        assert db.session.get(IconManifest, build_storage_key('saffron', 'spice')) is None
+        db.session.rollback()
+
+
+def test_pinned_catalog_icon_survives_last_release(app):
+    key = build_storage_key('egg', 'dairy', 'allergy')
+    with app.app_context():
+        pin_icons([('egg', 'dairy')], 'allergy')
+        add_icon_refs([('egg', 'dairy')], 'allergy')
+        assert release_icon_refs([('egg', 'dairy')], 'allergy') == []
+        row = db.session.get(IconManifest, key)
+        assert row is not None and row.pinned and row.ref_count == 0
+        db.session.commit()
+
+        rebuild_icon_manifest()
+        assert db.session.get(IconManifest, key).pinned
@@ -0,0 +1,67 @@
+from claude_icon_utils import build_storage_key, find_icon_match, set_icon_stored
+from icon_matching import best_match, normalize_name, similarity, singularize
+
+THRESHOLD = 0.6
+MULTIWORD_THRESHOLD = 0.75
+
+
+def match(name, candidate):
+    return best_match(normalize_name(name), [('icon.svg', normalize_name(candidate))], THRESHOLD, MULTIWORD_THRESHOLD)
+
+
+def test_ves_plurals():
+    assert singularize('olives') == 'olive'
+    assert singularize('chives') == 'chive'
+    assert singularize('cloves') == 'clove'
+    assert singularize('leaves') == 'leaf'
+    assert singularize('loaves') == 'loaf'
+    assert singularize('halves') == 'half'
+
+
+def test_plural_matches_singular():
+    assert normalize_name('Olives') == normalize_name('olive')
+    assert best_match(normalize_name('olives'), [('olive.svg', 'olive')], THRESHOLD) == 'olive.svg'
+
+
+def test_different_head_noun_does_not_match():
+    assert similarity(normalize_name('olive oil'), 'olive') >= THRESHOLD
+    assert best_match(normalize_name('olive oil'), [('olive.svg', 'olive')], THRESHOLD) is None
+    assert best_match('olive', [('olive-oil.svg', 'olive oil')], THRESHOLD) is None
+
+
+def test_same_head_noun_still_matches():
+    assert best_match(normalize_name('red onions'), [('red-onion.svg', 'red onion')], THRESHOLD) == 'red-onion.svg'
+    assert best_match(normalize_name('tomatos'), [('tomato.svg', 'tomato')], THRESHOLD) == 'tomato.svg'
+
+
+def test_modifier_with_same_head_noun_does_not_match():
+    for name, candidate in [('ice cream', 'cream'), ('red pepper', 'pepper'), ('raw sugar', 'sugar')]:
+        assert similarity(normalize_name(name), candidate) >= THRESHOLD
+        assert match(name, candidate) is None
+        assert match(candidate, name) is None
+    assert match('green bell pepper', 'bell pepper') is None
+
+
+def test_multi_word_names_need_the_higher_score():
+    # Spelling variants of the modifier still match
+    assert match('chili pepper', 'chilli pepper') == 'icon.svg'
+    assert match('chedar cheese', 'cheddar cheese') == 'icon.svg'
+    # Similar-looking modifiers of different foods score below the multi-word threshold
+    for name, candidate in [('beef stock', 'beet stock'), ('pear juice', 'peach juice'), ('pork sausage', 'park sausage')]:
+        assert similarity(name, candidate) >= THRESHOLD
+        assert match(name, candidate) is None
+
+
+def test_normalized_names_match_exactly():
+    assert match('Jalapeño Peppers', 'jalapeno pepper') == 'icon.svg'
+    assert match('brocoli', 'broccoli') is None
+
+
+def test_uncategorized_icon_is_not_reused_for_a_categorized_item(app):
+    with app.app_context():
+        set_icon_stored(build_storage_key('sumac', ''), 'sumac', '', 'ingredient', True)
+        assert find_icon_match('sumac', 'spice', 'ingredient') is None
+        assert find_icon_match('sumac', '', 'ingredient') == build_storage_key('sumac', '')
+
+        set_icon_stored(build_storage_key('sumac', 'spice'), 'sumac', 'spice', 'ingredient', True)
+        assert find_icon_match('sumacs', 'spice', 'ingredient') == build_storage_key('sumac', 'spice')
@@ -0,0 +1,78 @@
+import pytest
+
+from ingredient_search import ingredient_search
+
+
+@pytest.fixture
+def pantry(client, user):
+    user_id, headers = user
+    for name, category in [
+        ('Green Peas', 'vegetable'), ('pear', 'fruit'), ('peanut butter', 'spread'),
+        ('Crème fraîche', 'dairy'), ('50% cocoa', 'baking'), ('apple', 'fruit'),
+    ]:
+        client.post(f'/api/users/{user_id}/ingredients/', json={'name': name, 'category': category, 'skip_icon': True}, headers=headers)
+    return user_id, headers
+
+
+def search(client, user_id, headers, query):
+    response = client.get(f'/api/users/{user_id}/ingredients/search/{query}', headers=headers)
+    assert response.status_code == 200
+    return [item['name'] for item in response.get_json()['data']]
+
+
+def test_uses_fts5_on_sqlite(app):
+    assert ingredient_search.engine == 'fts5'
+
+
+def test_prefix_matches_rank_first(client, pantry):
+    user_id, headers = pantry
+    results = search(client, user_id, headers, '?q=pea')
+    assert sorted(results[:2]) == ['peanut butter', 'pear']
+    assert results[2:] == ['green peas']
+    assert search(client, user_id, headers, '?q=butt') == ['peanut butter']
+
+
+def test_search_folds_accents_and_ignores_punctuation(client, pantry):
+    user_id, headers = pantry
+    assert search(client, user_id, headers, '?q=creme') == ['crème fraîche']
+    assert search(client, user_id, headers, '?q=50%25') == ['50% cocoa']
+    assert search(client, user_id, headers, '?q=%22') == []
+
+
+def test_category_filter_limit_and_offset(client, pantry):
+    user_id, headers = pantry
+    assert search(client, user_id, headers, '?q=p&category=fruit') == ['pear']
+    first, second = search(client, user_id, headers, '?q=pea&limit=2')
+    assert search(client, user_id, headers, '?q=pea&limit=1&offset=1') == [second]
+    assert len(search(client, user_id, headers, '')) == 6
+
+    response = client.get(f'/api/users/{user_id}/ingredients/search/?q=pea&limit=x', headers=headers)
+    assert response.status_code == 400
+
+
+def test_only_the_users_own_ingredients_match(client, pantry, app):
+    user_id, headers = pantry
+    from app import generate_token
+    from db import db, User
+    with app.app_context():
+        other = User(username='searcher', email='searcher@example.com')
+        other.set_password('password')
+        db.session.add(other)
+        db.session.commit()
+        other_headers = {'Authorization': f"Bearer {generate_token(other.id)}"}
+        other_id = other.id
+
+    assert search(client, other_id, other_headers, '?q=pea') == []
+
+
+def test_renamed_and_deleted_ingredients_are_reindexed(client, pantry):
+    user_id, headers = pantry
+    url = f'/api/users/{user_id}/ingredients/'
+    pear = next(item for item in client.get(url, headers=headers).get_json()['data'] if item['name'] == 'pear')
+
+    client.put(f"{url}{pear['id']}/", json={'name': 'quince', 'category': 'fruit'}, headers=headers)
+    assert search(client, user_id, headers, '?q=quin') == ['quince']
+    assert 'pear' not in search(client, user_id, headers, '?q=pea')
+
+    client.delete(f"{url}{pear['id']}/", headers=headers)
+    assert search(client, user_id, headers, '?q=quin') == []
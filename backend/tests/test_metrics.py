@@ -0,0 +1,15 @@
+import app as app_module
+
+
+def test_metrics_is_off_by_default(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', '')
+    assert client.get('/metrics').status_code == 404
+
+
+def test_metrics_requires_the_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'scrape-secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert 'pools' in response.get_json()
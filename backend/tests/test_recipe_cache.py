@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ai_client import ai
+from db import db, RecipeCacheEntry
+from recipe_cache import RecipeCache
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    """Prompts sent to the model; every call answers with a fixed recipe."""
+    calls = []
+
+    def create_message(upstream, **kwargs):
+        calls.append(kwargs['messages'][0]['content'])
+        return SimpleNamespace(content=[SimpleNamespace(type='text', text=f'Recipe {len(calls)}')])
+
+    monkeypatch.setattr(ai, 'create_message', create_message)
+    return calls
+
+
+def suggestions(client, user_id, headers, query=''):
+    response = client.get(f'/api/users/{user_id}/recipe-suggestions/{query}', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def test_repeat_request_is_served_from_cache(client, user, model_calls):
+    user_id, headers = user
+    client.post(f'/api/users/{user_id}/ingredients/', json={'name': 'romanesco', 'skip_icon': True}, headers=headers)
+
+    first = suggestions(client, user_id, headers)
+    second = suggestions(client, user_id, headers)
+
+    assert (first['cached'], second['cached']) == (False, True)
+    assert second['recipes'] == first['recipes']
+    assert len(model_calls) == 1
+
+    # Different filters are a different prompt; refresh skips the cache
+    suggestions(client, user_id, headers, '?cuisine=italian')
+    assert suggestions(client, user_id, headers, '?refresh=true')['cached'] is False
+    assert len(model_calls) == 3
+
+
+def test_pantry_change_invalidates_cached_suggestions(client, user, model_calls):
+    user_id, headers = user
+    client.post(f'/api/users/{user_id}/ingredients/', json={'name': 'salsify', 'skip_icon': True}, headers=headers)
+    suggestions(client, user_id, headers)
+
+    client.post(f'/api/users/{user_id}/allergies/', json={'allergy_name': 'mustard', 'skip_icon': True}, headers=headers)
+
+    assert suggestions(client, user_id, headers)['cached'] is False
+    assert 'mustard' in model_calls[-1]
+
+
+def test_shared_tier_serves_other_workers(app, user):
+    user_id, _ = user
+    worker_a, worker_b = RecipeCache(), RecipeCache()
+    key = RecipeCache.make_key('Some  Prompt', 'model')
+    assert key == RecipeCache.make_key('some prompt', 'model')
+
+    with app.app_context():
+        worker_a.set(key, user_id, 'Shared recipe')
+        # worker_b has nothing in memory, so this comes from the table
+        assert worker_b.get(key) == 'Shared recipe'
+        assert key in worker_b._entries
+
+        worker_a.invalidate_user(user_id)
+        db.session.commit()
+        assert worker_a.get(key) is None
+        assert db.session.get(RecipeCacheEntry, key) is None
+
+
+def test_expired_entries_are_not_served(app, user):
+    user_id, _ = user
+    cache = RecipeCache()
+    cache.ttl = -1
+
+    with app.app_context():
+        cache.set('expired-key', user_id, 'Old recipe')
+        assert cache.get('expired-key') is None
+
+
+def test_memory_tier_is_bounded(app, user):
+    user_id, _ = user
+    cache = RecipeCache()
+    cache.shared = False
+    cache.max_entries = 2
+
+    with app.app_context():
+        for key in ('a', 'b', 'c'):
+            cache.set(key, user_id, key)
+        assert [cache.get(key) for key in ('a', 'b', 'c')] == [None, 'b', 'c']
@@ -0,0 +1,43 @@
+def save_recipe(client, user_id, headers, name, recipe):
+    response = client.post(f'/api/users/{user_id}/saved-recipes/', json={'name': name, 'recipe': recipe}, headers=headers)
+    assert response.status_code in (200, 201)
+
+
+def test_search_finds_recipe_body(client, user):
+    user_id, headers = user
+    save_recipe(client, user_id, headers, 'Thai Green Curry', 'Simmer coconut milk with green curry paste.')
+    save_recipe(client, user_id, headers, 'Pancakes', 'Whisk flour, milk and eggs.')
+
+    response = client.get(f'/api/users/{user_id}/saved-recipes/search/?q=curry', headers=headers)
+
+    assert response.status_code == 200
+    names = [item['name'] for item in response.get_json()['data']]
+    assert names == ['Thai Green Curry']
+
+
+def test_search_accepts_quoted_phrase(client, user):
+    user_id, headers = user
+    save_recipe(client, user_id, headers, 'Thai Green Curry', 'Simmer coconut milk with green curry paste.')
+
+    response = client.get(f'/api/users/{user_id}/saved-recipes/search/?q="green curry"', headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert [item['name'] for item in response.get_json()['data']] == ['Thai Green Curry']
+
+    revalidated = client.get(
+        f'/api/users/{user_id}/saved-recipes/search/?q="green curry"',
+        headers={**headers, 'If-None-Match': response.headers['ETag']},
+    )
+    assert revalidated.status_code == 304
+
+
+def test_snippet_highlights_are_distinct_from_bold_markdown(client, user):
+    user_id, headers = user
+    save_recipe(client, user_id, headers, 'Lentil Soup', 'Simmer lentils.\n**Nutrition (per serving):** ~400 cal | 20g protein <3')
+
+    response = client.get(f'/api/users/{user_id}/saved-recipes/search/?q=nutrition', headers=headers)
+
+    snippet = response.get_json()['data'][0]['snippet']
+    assert '**<mark>Nutrition</mark> (per serving):**' in snippet
+    assert '&lt;3' in snippet
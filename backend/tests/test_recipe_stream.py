@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from ai_client import ai
+
+
+def events(body):
+    """[(event, data)] parsed from a text/event-stream body."""
+    parsed = []
+    for block in body.split('\n\n'):
+        if not block:
+            continue
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        parsed.append((lines['event'], json.loads(lines['data'])))
+    return parsed
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    """Closed flags of the model streams; each streams two chunks."""
+    streams = []
+
+    def stream_text(upstream, **kwargs):
+        state = {'closed': False}
+        streams.append(state)
+        try:
+            yield 'Line one\n'
+            yield 'Line "two"'
+        finally:
+            state['closed'] = True
+
+    monkeypatch.setattr(ai, 'stream_text', stream_text)
+    return streams
+
+
+def stream_url(user_id, query=''):
+    return f'/api/users/{user_id}/recipe-suggestions/stream/{query}'
+
+
+def test_recipes_stream_as_framed_events(client, user, streamed):
+    user_id, headers = user
+    client.post(f'/api/users/{user_id}/ingredients/', json={'name': 'celeriac', 'skip_icon': True}, headers=headers)
+
+    response = client.get(stream_url(user_id), headers=headers)
+
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+    body = response.get_data(as_text=True)
+    assert body.startswith('event: meta\ndata: {') and body.endswith('event: done\ndata: {}\n\n')
+    (meta, meta_data), *rest = events(body)
+    assert meta == 'meta'
+    assert (meta_data['ingredients_used'], meta_data['cached']) == (['celeriac'], False)
+    assert rest == [
+        ('delta', {'text': 'Line one\n'}),
+        ('delta', {'text': 'Line "two"'}),
+        ('done', {}),
+    ]
+
+    # The joined text is cached and replayed as one delta
+    cached = events(client.get(stream_url(user_id), headers=headers).get_data(as_text=True))
+    assert cached[0][1]['cached'] is True
+    assert cached[1:] == [('delta', {'text': 'Line one\nLine "two"'}), ('done', {})]
+    assert len(streamed) == 1
+
+
+def test_model_error_ends_the_stream_with_an_error_event(client, user, monkeypatch):
+    user_id, headers = user
+    client.post(f'/api/users/{user_id}/ingredients/', json={'name': 'burdock', 'skip_icon': True}, headers=headers)
+
+    def failing_stream(upstream, **kwargs):
+        yield 'Partial'
+        raise RuntimeError('overloaded')
+
+    monkeypatch.setattr(ai, 'stream_text', failing_stream)
+    parsed = events(client.get(stream_url(user_id), headers=headers).get_data(as_text=True))
+
+    assert [event for event, _ in parsed] == ['meta', 'delta', 'error']
+    assert parsed[-1][1] == {'error': 'Error generating recipes'}
+
+
+def test_client_disconnect_closes_the_model_stream(client, user, streamed):
+    user_id, headers = user
+    client.post(f'/api/users/{user_id}/ingredients/', json={'name': 'sorrel', 'skip_icon': True}, headers=headers)
+
+    response = client.get(stream_url(user_id, '?refresh=true'), headers=headers, buffered=False)
+    chunks = response.response
+    next(chunks)  # meta
+    next(chunks)  # first delta
+    response.close()
+
+    assert streamed[0]['closed'] is True
@@ -0,0 +1,30 @@
+def save_recipe(client, user_id, headers, name):
+    response = client.post(f'/api/users/{user_id}/saved-recipes/', json={'name': name, 'recipe': f'{name} method'}, headers=headers)
+    assert response.status_code in (200, 201)
+
+
+def test_cursor_pages_through_recipes(client, user):
+    user_id, headers = user
+    for name in ('First', 'Second', 'Third'):
+        save_recipe(client, user_id, headers, name)
+
+    first = client.get(f'/api/users/{user_id}/saved-recipes/?limit=2&fields=id,name', headers=headers).get_json()
+    assert [item['name'] for item in first['data']] == ['Third', 'Second']
+
+    second = client.get(
+        f"/api/users/{user_id}/saved-recipes/?limit=2&fields=id,name&cursor={first['next_cursor']}", headers=headers
+    ).get_json()
+    assert [item['name'] for item in second['data']] == ['First']
+    assert second['next_cursor'] is None
+
+
+def test_malformed_cursor_is_400(client, user):
+    user_id, headers = user
+    for name in ('Soup', 'Stew'):
+        save_recipe(client, user_id, headers, name)
+    cursor = client.get(f'/api/users/{user_id}/saved-recipes/?limit=1', headers=headers).get_json()['next_cursor']
+
+    # A valid cursor with a quote spliced in used to decode and then break the ETag
+    for cursor in (cursor[:4] + '"' + cursor[4:], cursor + '.', 'a"b', 'not-a-cursor', 'WyJ4IiwgMV0', '%E2%9C%93', 'WzFd'):
+        response = client.get(f'/api/users/{user_id}/saved-recipes/?cursor={cursor}', headers=headers)
+        assert response.status_code == 400, cursor
@@ -0,0 +1,82 @@
+import base64
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from ai_client import ai
+from image_prep import image_hash
+from scan_cache import ScanCache, hamming_distance
+
+
+def photo(flip=False, quality=95, size=(640, 480)):
+    """JPEG of a horizontal gradient with a dark block, optionally mirrored."""
+    width, height = size
+    image = Image.new('RGB', size)
+    image.putdata([
+        (10, 10, 10) if width // 3 < x < width // 2 and height // 3 < y < height * 2 // 3 else (x * 255 // width, 120, 60)
+        for y in range(height) for x in range(width)
+    ])
+    if flip:
+        image = image.transpose(Image.FLIP_LEFT_RIGHT)
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def test_hash_tolerates_recompression_and_resizing_but_not_a_different_scene():
+    original = image_hash(photo())
+
+    assert hamming_distance(original, image_hash(photo(quality=40))) <= ScanCache().max_distance
+    assert hamming_distance(original, image_hash(photo(size=(320, 240)))) <= ScanCache().max_distance
+    assert hamming_distance(original, image_hash(photo(flip=True))) > ScanCache().max_distance
+
+
+@pytest.fixture
+def scans(app, monkeypatch):
+    """Number of model calls; each reports one item."""
+    calls = []
+
+    def create_message(upstream, **kwargs):
+        calls.append(upstream)
+        block = SimpleNamespace(type='tool_use', name='report_items', input={'items': [{'name': 'Carrot', 'category': 'Vegetable'}]})
+        return SimpleNamespace(content=[block], stop_reason='tool_use')
+
+    monkeypatch.setitem(app.config, 'ANTHROPIC_API_KEY', 'test-key')
+    monkeypatch.setattr(ai, 'create_message', create_message)
+    return calls
+
+
+def scan(client, user_id, headers, image, query=''):
+    response = client.post(
+        f'/api/users/{user_id}/scan-image/{query}',
+        json={'image': base64.b64encode(image).decode('ascii'), 'scan_type': 'ingredients'},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+def test_rescan_of_same_scene_is_served_from_cache(client, user, scans):
+    user_id, headers = user
+
+    first = scan(client, user_id, headers, photo())
+    again = scan(client, user_id, headers, photo(quality=40))
+
+    assert (first['cached'], again['cached']) == (False, True)
+    assert again['items'] == first['items']
+    assert len(scans) == 1
+
+    assert scan(client, user_id, headers, photo(flip=True))['cached'] is False
+    assert scan(client, user_id, headers, photo(), '?refresh=true')['cached'] is False
+    assert len(scans) == 3
+
+
+def test_scan_cache_is_per_user(client, user, scans, app):
+    user_id, headers = user
+    scan(client, user_id, headers, photo())
+
+    with app.app_context():
+        assert ScanCache().get(user_id + 1000, 'ingredients', image_hash(photo())) is None
+        assert ScanCache().get(user_id, 'allergies', image_hash(photo())) is None
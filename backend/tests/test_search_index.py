@@ -0,0 +1,32 @@
+from sqlalchemy.exc import OperationalError
+
+from ingredient_search import IngredientSearch
+from recipe_search import RecipeSearch
+
+
+class RacingEngine:
+    """Engine whose begin() fails as if another worker created the index first."""
+
+    def __init__(self, engine):
+        self._engine = engine
+        self.dialect = engine.dialect
+
+    def begin(self):
+        raise OperationalError('CREATE ...', {}, Exception('table already exists'))
+
+    def connect(self):
+        return self._engine.connect()
+
+
+def test_engine_is_kept_when_index_creation_races(app, monkeypatch):
+    from db import db
+    with app.app_context():
+        real_engine = db.engine
+        monkeypatch.setattr(type(db), 'engine', property(lambda self: RacingEngine(real_engine)))
+
+        ingredients, recipes = IngredientSearch(), RecipeSearch()
+        ingredients.ensure_index()
+        recipes.ensure_index()
+
+    assert ingredients.engine == 'fts5'
+    assert recipes.engine == 'fts5'
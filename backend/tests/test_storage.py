@@ -0,0 +1,68 @@
+import os
+from io import BytesIO
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from cloud_storage_config import S3Storage
+from local_storage import LocalStorage
+from storage_backend import MemoryStorage
+
+
+@pytest.fixture(params=['memory', 'local'])
+def backend(request, tmp_path):
+    return MemoryStorage() if request.param == 'memory' else LocalStorage(tmp_path)
+
+
+def test_upload_read_and_list(backend):
+    assert backend.upload_image(BytesIO(b'<svg/>'), 'ingredients/generated_images/leek.svg', content_type='image/svg+xml')
+    backend.upload_image(BytesIO(b'png'), 'allergies/generated_images/soy.png')
+
+    assert backend.exists('ingredients/generated_images/leek.svg')
+    assert backend.read('ingredients/generated_images/leek.svg') == (b'<svg/>', 'image/svg+xml')
+    assert list(backend.list_keys('ingredients/')) == ['ingredients/generated_images/leek.svg']
+
+
+def test_delete_many(backend):
+    keys = [f'ingredients/generated_images/{name}.svg' for name in ('a', 'b', 'c')]
+    for key in keys:
+        backend.upload_image(BytesIO(b'<svg/>'), key)
+
+    # Keys that are already gone are not failures
+    assert backend.delete_many(keys[:2] + ['ingredients/generated_images/missing.svg']) == []
+    assert [backend.exists(key) for key in keys] == [False, False, True]
+    assert backend.delete(keys[2])
+    assert not backend.delete(keys[2])
+
+
+def test_local_storage_rejects_keys_outside_its_directory(tmp_path):
+    backend = LocalStorage(tmp_path / 'assets')
+    with pytest.raises(ValueError):
+        backend.upload_image(BytesIO(b'x'), '../escaped.png')
+    assert not backend.exists('../escaped.png')
+    assert not os.path.exists(tmp_path / 'escaped.png')
+
+
+def test_local_storage_finds_extension(tmp_path):
+    backend = LocalStorage(tmp_path)
+    backend.upload_image(BytesIO(b'png'), 'allergies/generated_images/soy.png')
+
+    assert backend.find_extension('allergies/generated_images/soy', ['.svg', '.png']) == '.png'
+    assert backend.find_extension('allergies/generated_images/egg', ['.svg', '.png']) is None
+
+
+def test_s3_delete_many_reports_keys_it_could_not_delete(monkeypatch):
+    client = boto3.client('s3', region_name='auto', aws_access_key_id='x', aws_secret_access_key='x',
+                          endpoint_url='https://r2.example.com')
+    backend = S3Storage()
+    backend.bucket_name = 'icons'
+    monkeypatch.setattr(S3Storage, 'client', property(lambda self: client))
+
+    with Stubber(client) as stub:
+        stub.add_response(
+            'delete_objects',
+            {'Errors': [{'Key': 'b.svg', 'Code': 'AccessDenied', 'Message': 'Access Denied'}]},
+            {'Bucket': 'icons', 'Delete': {'Objects': [{'Key': 'a.svg'}, {'Key': 'b.svg'}], 'Quiet': True}},
+        )
+        assert backend.delete_many(['a.svg', 'b.svg']) == ['b.svg']
@@ -0,0 +1,61 @@
+from db import db
+from user_cache import UserReadCache, user_cache
+
+
+def test_bump_increments_the_version_inside_the_transaction(app, user):
+    user_id, _ = user
+    with app.app_context():
+        start = user_cache.version(user_id)
+        user_cache.bump(user_id)
+        user_cache.bump(user_id)
+        db.session.commit()
+        assert user_cache.version(user_id) == start + 2
+
+        # A rolled-back write leaves cached reads valid
+        user_cache.bump(user_id)
+        db.session.rollback()
+        assert user_cache.version(user_id) == start + 2
+
+
+def test_entry_is_only_served_for_its_version():
+    cache = UserReadCache()
+    cache.set(1, 'ingredients', 3, b'[]')
+
+    assert cache.get(1, 'ingredients', 3) == b'[]'
+    assert cache.get(1, 'ingredients', 4) is None
+    assert cache.get(1, 'allergies', 3) is None
+    assert cache.get(2, 'ingredients', 3) is None
+
+
+def test_cache_is_bounded_by_entries_and_bytes():
+    cache = UserReadCache()
+    cache.max_entries = 2
+    cache.max_bytes = 10
+    cache.set(1, 'a', 1, b'1234')
+    cache.set(1, 'b', 1, b'1234')
+    cache.set(1, 'c', 1, b'1234')
+    assert cache.get(1, 'a', 1) is None
+    assert cache.get(1, 'c', 1) == b'1234'
+
+    cache.set(1, 'd', 1, b'12345678')
+    assert cache.get(1, 'b', 1) is None and cache.get(1, 'c', 1) is None
+    cache.set(1, 'too-big', 1, b'12345678901')
+    assert cache.get(1, 'too-big', 1) is None
+    assert cache._bytes == 8
+
+
+def test_write_through_any_route_refreshes_cached_list(client, user, app):
+    user_id, headers = user
+    url = f'/api/users/{user_id}/ingredients/'
+    assert client.get(url, headers=headers).get_json()['data'] == []
+    with app.app_context():
+        assert user_cache.get(user_id, 'ingredients', user_cache.version(user_id)) == b'{"success": true, "data": []}'
+
+    created = client.post(url, json={'name': 'okra', 'skip_icon': True}, headers=headers).get_json()['data']
+    assert [item['name'] for item in client.get(url, headers=headers).get_json()['data']] == ['okra']
+
+    client.put(f"{url}{created['id']}/", json={'name': 'okra pods'}, headers=headers)
+    assert [item['name'] for item in client.get(url, headers=headers).get_json()['data']] == ['okra pods']
+
+    client.delete(f"{url}{created['id']}/", headers=headers)
+    assert client.get(url, headers=headers).get_json()['data'] == []
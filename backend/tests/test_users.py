@@ -0,0 +1,15 @@
+from db import db, User
+from user_cache import user_cache
+
+
+def test_get_user_deleted_elsewhere_is_404(client, user, app):
+    user_id, headers = user
+    assert client.get(f'/api/users/{user_id}/', headers=headers).status_code == 200
+
+    # Another worker deletes the user while this one still caches that it exists
+    with app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+    assert user_cache.user_exists(user_id)
+
+    assert client.get(f'/api/users/{user_id}/', headers=headers).status_code == 404
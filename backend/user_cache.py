@@ -0,0 +1,95 @@
+# user_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db import db, User, UserVersion
+
+
+class UserReadCache:
+    """In-process cache of serialized per-user read responses.
+
+    Entries are tagged with the user's version from the user_versions table.
+    Write routes bump that version inside their transaction, so every
+    worker sees the change on its next read and rebuilds the entry. A hit
+    costs one primary-key lookup instead of ORM queries and serialization.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('USER_CACHE_ENABLED', 'true').lower() == 'true'
+        self.max_entries = int(os.getenv('USER_CACHE_MAX_ENTRIES', '1024'))
+        self.max_bytes = int(os.getenv('USER_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self.exists_ttl = float(os.getenv('USER_EXISTS_TTL_SECONDS', '30'))
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, collection) -> (version, body)
+        self._bytes = 0
+        self._known_users = {}  # user_id -> expires_at (monotonic)
+
+    def user_exists(self, user_id):
+        """Whether the user exists, remembered for exists_ttl seconds.
+
+        A user deleted through another worker can still pass for up to the
+        TTL; ownership-scoped queries and foreign keys cover that window.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._known_users.get(user_id)
+        if expires_at is not None and expires_at > now:
+            return True
+
+        if db.session.get(User, user_id) is None:
+            return False
+        with self._lock:
+            if len(self._known_users) >= self.max_entries * 4:
+                self._known_users = {uid: exp for uid, exp in self._known_users.items() if exp > now}
+            self._known_users[user_id] = now + self.exists_ttl
+        return True
+
+    def forget_user(self, user_id):
+        with self._lock:
+            self._known_users.pop(user_id, None)
+
+    def version(self, user_id):
+        return db.session.scalar(select(UserVersion.version).where(UserVersion.user_id == user_id)) or 0
+
+    def bump(self, user_id):
+        """Invalidate the user's cached reads everywhere. Runs in the caller's transaction."""
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        stmt = dialect.insert(UserVersion.__table__).values(user_id=user_id, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'version': UserVersion.__table__.c.version + 1},
+        )
+        db.session.execute(stmt)
+
+    def get(self, user_id, collection, version):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get((user_id, collection))
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end((user_id, collection))
+            return entry[1]
+
+    def set(self, user_id, collection, version, body):
+        if not self.enabled or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((user_id, collection), None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[(user_id, collection)] = (version, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+# Initialize singleton
+user_cache = UserReadCache()
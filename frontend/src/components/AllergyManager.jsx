@@ -187,19 +187,21 @@ export default function AllergyManager({ userId }) {
     ));
 
     const addedIds = [];
-    for (const item of newItems) {
+    if (newItems.length > 0) {
       try {
-        const res = await api.post(`/api/users/${userId}/allergies/`, {
-          allergy_name: item.name,
-          allergy_category: item.category || '',
+        const res = await api.post(`/api/users/${userId}/allergies/bulk/`, {
+          items: newItems.map(item => ({
+            allergy_name: item.name,
+            allergy_category: item.category || '',
+          })),
           skip_icon: true,
         });
         if (res.data.success) {
-          setAllergies((prev) => [...prev, res.data.data]);
-          addedIds.push(res.data.data.id);
+          setAllergies((prev) => [...prev, ...res.data.data]);
+          res.data.data.forEach(allergy => addedIds.push(allergy.id));
         }
       } catch {
-        // skip failed items silently
+        setFormError("Failed to add scanned allergies.");
       }
     }
 
@@ -213,21 +213,23 @@ export default function IngredientManager({ user }) {
     ));
 
     const addedIds = [];
-    for (const item of newItems) {
+    if (newItems.length > 0) {
       try {
-        const res = await api.post(`/api/users/${user.id}/ingredients/`, {
-          name: item.name,
-          category: item.category || '',
-          quantity: item.quantity ? parseFloat(item.quantity) : null,
-          unit: item.unit || '',
+        const res = await api.post(`/api/users/${user.id}/ingredients/bulk/`, {
+          items: newItems.map(item => ({
+            name: item.name,
+            category: item.category || '',
+            quantity: item.quantity ? parseFloat(item.quantity) : null,
+            unit: item.unit || '',
+          })),
           skip_icon: true,
         });
         if (res.data.success) {
-          setIngredients((prev) => [...prev, res.data.data]);
-          addedIds.push(res.data.data.id);
+          setIngredients((prev) => [...prev, ...res.data.data]);
+          res.data.data.forEach(ing => addedIds.push(ing.id));
         }
       } catch {
-        // skip failed items silently
+        setFormError("Failed to add scanned ingredients.");
       }
     }
 
@@ -18,11 +18,12 @@ const RecipeSuggestions = ({ user, userId: userIdProp }) => {
   const [messageModal, setMessageModal] = useState({ show: false, message: "", success: true });
   const recipeRef = useRef(null);
 
+  const hasRecipes = recipes !== "";
   useEffect(() => {
-    if (recipes && recipeRef.current) {
+    if (hasRecipes && recipeRef.current) {
       recipeRef.current.scrollIntoView({ behavior: "smooth" });
     }
-  }, [recipes]);
+  }, [hasRecipes]);
 
   const fetchRecipes = async () => {
     setLoading(true);
@@ -34,14 +35,40 @@ const RecipeSuggestions = ({ user, userId: userIdProp }) => {
     if (diet) params.append("diet", diet);
 
     try {
-      const response = await api.get(`/api/users/${userId}/recipe-suggestions/?${params.toString()}`);
-      const result = response.data;
+      // Stream the suggestions so the first recipe renders while the rest is generated
+      const response = await fetch(
+        `${process.env.REACT_APP_API_URL || ''}/api/users/${userId}/recipe-suggestions/stream/?${params.toString()}`,
+        { headers: { Authorization: `Bearer ${localStorage.getItem('token')}` } }
+      );
 
-      if (result.success) {
-        setRecipes(result.data.recipes || "");
-      } else {
+      if (!response.ok || !response.body) {
+        const result = await response.json().catch(() => ({}));
         setError(result.error || "Failed to get recipes.");
         setRecipes("");
+        return;
+      }
+
+      setRecipes("");
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "{}");
+          if (event === "delta") {
+            setRecipes((prev) => prev + data.text);
+          } else if (event === "error") {
+            setError(data.error || "Failed to get recipes.");
+          }
+        }
       }
     } catch (err) {
       setError("Network error while fetching recipe suggestions.");
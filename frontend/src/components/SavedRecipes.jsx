@@ -2,8 +2,14 @@ import React, { useState, useEffect } from "react";
 import api from '../axios';
 import ReactMarkdown from 'react-markdown';
 
+// The list only needs names and a preview; full recipe text is fetched on demand
+const LIST_FIELDS = 'id,name,created_at,preview';
+const PAGE_SIZE = 24;
+
 const SavedRecipes = ({ user }) => {
   const [recipes, setRecipes] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [selectedRecipe, setSelectedRecipe] = useState(null);
@@ -13,14 +19,27 @@ const SavedRecipes = ({ user }) => {
   const [recipeBeingRenamed, setRecipeBeingRenamed] = useState(null);
   const [messageModal, setMessageModal] = useState({ show: false, message: '', success: true });
 
+  const fetchPage = (cursor) =>
+    api.get(`/api/users/${userId}/saved-recipes/`, {
+      params: { fields: LIST_FIELDS, limit: PAGE_SIZE, ...(cursor ? { cursor } : {}) },
+    });
+
+  const fetchRecipeText = async (recipeId) => {
+    const response = await api.get(`/api/users/${userId}/saved-recipes/${recipeId}`);
+    return response.data.data;
+  };
+
   useEffect(() => {
     async function fetchSavedRecipes() {
       try {
         setLoading(true);
-        const response = await api.get(`/api/users/${userId}/saved-recipes/`);
+        const response = await api.get(`/api/users/${userId}/saved-recipes/`, {
+          params: { fields: LIST_FIELDS, limit: PAGE_SIZE },
+        });
         const result = response.data;
         if (result.success) {
           setRecipes(result.data || []);
+          setNextCursor(result.next_cursor || null);
           setError(null);
         } else {
           setError(result.error || "Failed to load saved recipes.");
@@ -34,6 +53,39 @@ const SavedRecipes = ({ user }) => {
     if (userId) fetchSavedRecipes();
   }, [userId]);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const result = (await fetchPage(nextCursor)).data;
+      if (result.success) {
+        setRecipes((prev) => [...prev, ...(result.data || [])]);
+        setNextCursor(result.next_cursor || null);
+      }
+    } catch {
+      setMessageModal({ show: true, message: "Network error loading more recipes.", success: false });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const openRecipe = async (recipe) => {
+    try {
+      setSelectedRecipe(await fetchRecipeText(recipe.id));
+    } catch {
+      setMessageModal({ show: true, message: "Network error loading recipe.", success: false });
+    }
+  };
+
+  const saveSummaryLocally = async (recipe) => {
+    try {
+      const full = await fetchRecipeText(recipe.id);
+      saveRecipeLocally(full.recipe || "", full.name || "recipe");
+    } catch {
+      setMessageModal({ show: true, message: "Network error loading recipe.", success: false });
+    }
+  };
+
   const saveRecipeLocally = (text, name = "recipe") => {
     const blob = new Blob([text], { type: "text/plain;charset=utf-8" });
     const url = URL.createObjectURL(blob);
@@ -62,9 +114,12 @@ const SavedRecipes = ({ user }) => {
       setMessageModal({ show: true, message: `Error deleting recipe: ${err.message}`, success: false });
       // On error, refetch recipes to sync UI
       try {
-        const resp = await api.get(`/api/users/${userId}/saved-recipes/`);
+        const resp = await fetchPage(null);
         const resJson = resp.data;
-        if (resJson.success) setRecipes(resJson.data || []);
+        if (resJson.success) {
+          setRecipes(resJson.data || []);
+          setNextCursor(resJson.next_cursor || null);
+        }
       } catch {
         // ignore
       }
@@ -107,10 +162,7 @@ const SavedRecipes = ({ user }) => {
         
         <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">
         {recipes.map((recipe) => {
-          const preview =
-            (typeof recipe === "string"
-              ? recipe
-              : recipe.recipe || "No preview available.") || "";
+          const preview = recipe.preview || "No preview available.";
           const plainPreview = preview.replace(/#{1,6}\s*/g, '').replace(/\*\*/g, '').replace(/---/g, '').trim();
           const previewSnippet =
             plainPreview.length > 120 ? plainPreview.slice(0, 120) + "..." : plainPreview;
@@ -118,7 +170,7 @@ const SavedRecipes = ({ user }) => {
           return (
             <article
               key={recipe.id}
-              onClick={() => setSelectedRecipe(recipe)}
+              onClick={() => openRecipe(recipe)}
               tabIndex={0}
               role="button"
               aria-label={`View recipe: ${recipe.name || "Unnamed"}`}
@@ -126,7 +178,7 @@ const SavedRecipes = ({ user }) => {
                 transform transition duration-300 ease-in-out
                 hover:scale-[1.03] hover:shadow-2xl hover:shadow-purple-500/30 hover:from-indigo-50 hover:to-purple-100 focus:outline-none focus:ring-4 focus:ring-purple-400"
               onKeyDown={(e) => {
-                if (e.key === "Enter") setSelectedRecipe(recipe);
+                if (e.key === "Enter") openRecipe(recipe);
               }}
             >
               <h3 className="font-semibold text-lg text-gray-800 mb-2 truncate">
@@ -139,12 +191,7 @@ const SavedRecipes = ({ user }) => {
                 <button
                   onClick={(e) => {
                     e.stopPropagation();
-                    saveRecipeLocally(
-                      typeof recipe === "string"
-                        ? recipe
-                        : recipe.recipe || "",
-                      recipe.name || "recipe"
-                    );
+                    saveSummaryLocally(recipe);
                   }}
                   className="bg-gradient-to-r from-emerald-500 to-teal-600 hover:from-emerald-600 hover:to-teal-700 text-white text-sm rounded-lg px-4 py-2 font-medium
                     transition-all duration-200 ease-in-out
@@ -184,6 +231,18 @@ const SavedRecipes = ({ user }) => {
           );
         })}
         </div>
+
+        {nextCursor && (
+          <div className="mt-8 flex justify-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="bg-purple-600 hover:bg-purple-700 disabled:opacity-60 text-white font-medium px-6 py-2 rounded-lg transition"
+            >
+              {loadingMore ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
 
       {selectedRecipe && (
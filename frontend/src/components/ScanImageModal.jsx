@@ -40,6 +40,7 @@ function cropItemFromImage(imageDataUrl, bbox) {
 export default function ScanImageModal({ userId, scanType, onItemsConfirmed, onClose }) {
   const [preview, setPreview] = useState(null);
   const [imageData, setImageData] = useState(null);
+  const [imageFile, setImageFile] = useState(null);
   const [scanning, setScanning] = useState(false);
   const [detectedItems, setDetectedItems] = useState(null);
   const [editedItems, setEditedItems] = useState([]);
@@ -51,6 +52,7 @@ export default function ScanImageModal({ userId, scanType, onItemsConfirmed, onC
     const file = e.target.files[0];
     if (!file) return;
 
+    setImageFile(file);
     const reader = new FileReader();
     reader.onload = (ev) => {
       setPreview(ev.target.result);
@@ -64,14 +66,15 @@ export default function ScanImageModal({ userId, scanType, onItemsConfirmed, onC
   };
 
   const handleScan = async () => {
-    if (!imageData) return;
+    if (!imageFile) return;
     setScanning(true);
     setError('');
     try {
-      const res = await api.post(`/api/users/${userId}/scan-image/`, {
-        image: imageData,
-        scan_type: scanType,
-      });
+      // Send the file itself rather than the base64 data URL used for the preview
+      const form = new FormData();
+      form.append('image', imageFile);
+      form.append('scan_type', scanType);
+      const res = await api.post(`/api/users/${userId}/scan-image/`, form);
       const { items } = res.data.data;
       if (!items || items.length === 0) {
         setError('No items detected in the image. Try a clearer photo.');